@@ -0,0 +1,319 @@
+"""Benchmark the dashboard pipeline headlessly on synthetic trackers of any size.
+
+The generator resamples the real tracker row by row, so type, theme and
+subtheme combinations and their x-flags stay consistent. It then swaps in
+generated entities (a long-tailed mix of the real ones and new ones),
+partner lists, country lists from one country to the whole continent,
+dates, amounts (log-normal, some in EUR, some missing), and details text
+drawn from the real vocabulary.
+
+Each stage is timed without Streamlit: reading and cleaning the CSV,
+building the child tables and indexes, writing and reading the compiled
+artifact, then, for a set of representative filter and search selections,
+the filter chain, the pie and country aggregation, building and
+serialising the figures, and generating one page of card HTML. Times are
+the median of --repeat runs. Peak memory is what each stage allocates on
+top of what was already held when it started, measured in a separate pass
+under tracemalloc, which would otherwise slow the timed runs down. The
+memory the loaded dataset keeps resident is reported per structure (see
+rddata.memory_usage).
+
+Each size runs in its own process, so one size's memory does not inflate
+the next one's and a size that runs out of memory is recorded (with the
+stage it died in) instead of losing the whole run.
+
+    python benchmark.py [--sizes 1000,10000,100000] [--repeat 3] [--out FILE] [--compare BASE]
+
+With --compare, the exit status is 1 when any stage is more than
+REGRESSION_RATIO times slower than in the baseline, so CI can gate on it.
+"""
+import argparse
+import json
+import os
+import platform
+import resource
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import tracemalloc
+
+import numpy as np
+import pandas as pd
+
+import rddata
+import rdgeo
+import rdicons
+import rdpipeline
+
+SIZES = [1000, 10000, 100000]
+PAGE_SIZE = 25
+# a stage is reported as a regression when it is this much slower than the baseline
+REGRESSION_RATIO = 1.2
+
+
+def synth_frame(n, seed=0, source=rddata.CSV_PATH):
+    """n synthetic tracker rows with the real CSV's columns."""
+    rng = np.random.default_rng(seed)
+    real = pd.read_csv(source)
+    real = real.loc[:, ~real.columns.str.startswith('Unnamed:')]
+    df = real.iloc[rng.integers(0, len(real), n)].reset_index(drop=True)
+
+    # entities: popular real ones plus a long tail of new ones (~n/20 in all)
+    real_entities = real['entity'].dropna().unique()
+    n_entities = max(len(real_entities), n // 20)
+    names = np.concatenate([real_entities, [f"Synthetic Entity {i}" for i in range(n_entities - len(real_entities))]])
+    df['entity'] = names[np.minimum(rng.zipf(1.5, n) - 1, len(names) - 1)]
+    df['commName'] = df['commName'].astype(str) + ' (' + pd.Series(np.arange(n)).astype(str) + ')'
+
+    partner_pool = np.concatenate([real['partners'].dropna().str.split('[;,]').explode().str.strip().unique(),
+                                   names[:200]])
+    n_partners = rng.poisson(1.5, n)
+    df['partners'] = [', '.join(rng.choice(partner_pool, k, replace=False)) if k else np.nan for k in n_partners]
+
+    countries = np.array(rdgeo.african_countries)
+    continental = rng.random(n) < 0.2
+    n_countries = np.clip(rng.geometric(0.35, n), 1, 12)
+    lists = [', '.join(countries) if whole else ', '.join(rng.choice(countries, k, replace=False))
+             for whole, k in zip(continental, n_countries)]
+    df['geoOld'] = lists
+    df['geography'] = np.where(continental, 'Africa region', lists)
+    df['geoLev'] = np.where(continental, 2, 1)
+
+    words = real['details'].dropna().str.split().explode().to_numpy()
+    lengths = np.clip(rng.lognormal(np.log(85), 0.5, n).astype(int), 20, 400)
+    df['details'] = [' '.join(rng.choice(words, k)) for k in lengths]
+
+    dates = pd.Timestamp('2020-01-01') + pd.to_timedelta(rng.integers(0, 5 * 365, n), unit='D')
+    df['date'] = dates.strftime('%d-%b-%y').str.lstrip('0')
+
+    amounts = np.round(rng.lognormal(np.log(2e7), 1.5, n), -3)
+    has_amount = rng.random(n) < 0.5
+    in_euros = rng.random(n) < 0.3
+    df['amnt'] = np.where(~has_amount, None,
+                          np.where(in_euros, [f"€{a / 1e6:.1f} million" for a in amounts], amounts.astype(np.int64).astype(str)))
+    df['amntUSD'] = np.where(has_amount, np.where(in_euros, amounts * 1.08, amounts), np.nan)
+    return df
+
+
+def selections(dataset):
+    """Representative sidebar selections: (name, selection)."""
+    options = dataset.options
+    entity = dataset.df['entity'].value_counts().index[0]
+    return [
+        ('all', ('', 'All', 'All', 'All', 'All', 'All')),
+        ('type', ('', 'Financial', 'All', 'All', 'All', 'All')),
+        ('type+theme', ('', 'In-kind', 'Clinical trials', 'All', 'All', 'All')),
+        ('subtheme', ('', 'All', 'All', options['subthemes'][0], 'All', 'All')),
+        ('entityType+entity', ('', 'All', 'All', 'All', dataset.df['entityType'].iloc[0], entity)),
+        ('search', ('vaccine', 'All', 'All', 'All', 'All', 'All')),
+        ('search+type', ('clinical trial', 'Financial', 'All', 'All', 'All', 'All')),
+        ('search miss', ('zzzz', 'All', 'All', 'All', 'All', 'All')),
+        ('dates', ('', 'All', 'All', 'All', 'All', 'All', '2022-01-01', '2022-12-31')),
+        ('type+dates', ('', 'Financial', 'All', 'All', 'All', 'All', '2021-07-01', None)),
+    ]
+
+
+def load_steps(csv_path, out_dir):
+    """(name, function of the earlier stages' results) for loading the tracker."""
+    return [
+        ('read_csv', lambda r: rddata.read_tracker(csv_path)),
+        ('clean', lambda r: rddata.clean_frame(r['read_csv'])),
+        ('children', lambda r: rddata.build_children(r['clean'])),
+        ('index', lambda r: rddata.build_dataset(r['clean'], 'bench', r['children'])),
+        ('compile', lambda r: rddata.write_compiled(r['index'], out_dir)),
+        ('load_compiled', lambda r: rddata.read_compiled(out_dir, 'bench')),
+    ]
+
+
+def view_steps(dataset, icons):
+    """Yield (stage, ms, payload bytes or None) for each representative selection.
+
+    Each stage runs only once the previous one has been yielded, so the
+    caller's peak measurement between yields covers that stage alone.
+    """
+    # the geometry inlined in the map, as the dashboard sends it without static serving
+    geojson = rdgeo.africa_geojson()
+    for name, selection in selections(dataset):
+        # compute_view's two stages, run apart so each gets its own peak
+        start = time.perf_counter()
+        filtered = rddata.apply_filters(dataset, selection)
+        yield f'{name}.filter', (time.perf_counter() - start) * 1000, None
+
+        start = time.perf_counter()
+        view = {'mask': filtered['mask'], 'rows': filtered['rows'], **rddata.aggregate(dataset, filtered)}
+        yield f'{name}.aggregate', (time.perf_counter() - start) * 1000, None
+
+        start = time.perf_counter()
+        figures = rdpipeline.build_figures(dataset, view, geojson, cache=None)
+        payload = sum(len(fig.to_json()) for fig in figures.values())
+        yield f'{name}.figures', (time.perf_counter() - start) * 1000, payload
+
+        start = time.perf_counter()
+        rows = rdpipeline.paginate(view['rows'], 1, PAGE_SIZE)[0]
+        html = rdpipeline.render_cards(dataset.df.iloc[rows], icons, details=True)
+        yield f'{name}.cards', (time.perf_counter() - start) * 1000, int(html.str.len().sum())
+
+
+def mark():
+    """Start a new peak measurement; returns the memory allocated now."""
+    tracemalloc.reset_peak()
+    return tracemalloc.get_traced_memory()[0]
+
+
+def progress(stage):
+    """Tell the parent process which stage is running, for when this one gets killed."""
+    print(f"stage {stage}", file=sys.stderr, flush=True)
+
+
+def run_size(n, repeat, seed=0):
+    """(Benchmark results, resident bytes per dataset structure) for an n-row synthetic tracker."""
+    work_dir = tempfile.mkdtemp(prefix='rdbench-')
+    try:
+        csv_path = os.path.join(work_dir, 'tracker.csv')
+        synth_frame(n, seed).to_csv(csv_path, index=False)
+        icons = rdicons.IconRegistry()
+        times, peaks, payloads = {}, {}, {}
+
+        for run in range(repeat + 1):
+            traced = run == repeat  # last pass: memory only
+            state = {}
+            if traced:
+                tracemalloc.start()
+            baseline = mark() if traced else 0
+            for name, func in load_steps(csv_path, os.path.join(work_dir, 'compiled')):
+                progress(name)
+                start = time.perf_counter()
+                state[name] = func(state)
+                if traced:
+                    peaks[name] = (tracemalloc.get_traced_memory()[1] - baseline) // 1024
+                    baseline = mark()
+                else:
+                    times.setdefault(name, []).append((time.perf_counter() - start) * 1000)
+            dataset = state['index']
+            memory = rddata.memory_usage(dataset)
+            state.clear()  # only the indexed dataset is needed from here on
+            progress('views')
+            for name, ms, payload in view_steps(dataset, icons):
+                if traced:
+                    peaks[name] = (tracemalloc.get_traced_memory()[1] - baseline) // 1024
+                    baseline = mark()
+                else:
+                    times.setdefault(name, []).append(ms)
+                    if payload is not None:
+                        payloads[name] = payload
+            if traced:
+                tracemalloc.stop()
+
+        results = [{
+            'rows': n,
+            'stage': name,
+            'ms': round(statistics.median(runs), 3),
+            'runs_ms': [round(ms, 3) for ms in runs],
+            'peak_kb': peaks.get(name),
+            'payload_bytes': payloads.get(name),
+        } for name, runs in times.items()]
+        return results, memory
+    finally:
+        shutil.rmtree(work_dir, ignore_errors=True)
+
+
+def run_worker(n, repeat, seed):
+    """run_size in a child process: (results, max RSS in KB, resident bytes, error or None)."""
+    proc = subprocess.run([sys.executable, __file__, '--worker', str(n), '--repeat', str(repeat), '--seed', str(seed)],
+                          capture_output=True, text=True)
+    if proc.returncode == 0:
+        report = json.loads(proc.stdout)
+        return report['results'], report['max_rss_kb'], report['memory'], None
+    stages = [line.split(' ', 1)[1] for line in proc.stderr.splitlines() if line.startswith('stage ')]
+    if proc.returncode < 0:
+        error = f"killed by signal {-proc.returncode}" + (" (out of memory?)" if proc.returncode == -9 else '')
+    else:
+        error = proc.stderr.strip().splitlines()[-1] if proc.stderr.strip() else f"exit status {proc.returncode}"
+    return [], None, None, f"{error} during {stages[-1] if stages else 'setup'}"
+
+
+def metadata():
+    try:
+        commit = subprocess.run(['git', 'rev-parse', '--short', 'HEAD'], capture_output=True, text=True,
+                                check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        commit = None
+    return {
+        'timestamp': time.strftime('%Y-%m-%dT%H:%M:%S'),
+        'commit': commit,
+        'python': platform.python_version(),
+        'pandas': pd.__version__,
+        'numpy': np.__version__,
+        'machine': platform.machine(),
+        'cpus': os.cpu_count(),
+    }
+
+
+def compare(base, results):
+    """Print per-stage ratios against a baseline run; returns the stages that got slower."""
+    before = {(r['rows'], r['stage']): r['ms'] for r in base['results']}
+    slower = []
+    print(f"\nCompared with {base['meta'].get('commit')} ({base['meta'].get('timestamp')}):")
+    for r in results:
+        old = before.get((r['rows'], r['stage']))
+        if not old:
+            continue
+        ratio = r['ms'] / old
+        flag = '  SLOWER' if ratio > REGRESSION_RATIO else ''
+        print(f"  {r['rows']:>7} {r['stage']:<28} {old:10.2f} -> {r['ms']:10.2f} ms  x{ratio:.2f}{flag}")
+        if flag:
+            slower.append(r)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sizes', default=','.join(map(str, SIZES)), help='comma-separated row counts')
+    parser.add_argument('--repeat', type=int, default=3)
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='bench.json', help='where to save the results as JSON')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare with')
+    parser.add_argument('--worker', type=int, help=argparse.SUPPRESS)  # run one size, print its results
+    args = parser.parse_args()
+
+    if args.worker:
+        results, memory = run_size(args.worker, args.repeat, args.seed)
+        json.dump({'results': results, 'memory': memory,
+                   'max_rss_kb': resource.getrusage(resource.RUSAGE_SELF).ru_maxrss}, sys.stdout)
+        return
+
+    results, sizes = [], []
+    for n in map(int, args.sizes.split(',')):
+        start = time.perf_counter()
+        rows, max_rss_kb, memory, error = run_worker(n, args.repeat, args.seed)
+        results += rows
+        sizes.append({'rows': n, 'max_rss_kb': max_rss_kb, 'memory': memory, 'error': error})
+        print(f"{n} rows ({time.perf_counter() - start:.1f} s, "
+              f"{f'{max_rss_kb // 1024} MB max RSS' if max_rss_kb else 'failed'}):")
+        if error:
+            print(f"  FAILED: {error}")
+        if memory:
+            print('  resident: ' + ', '.join(f"{name} {size / 2**20:.1f} MB" for name, size in memory.items()))
+        for r in rows:
+            peak = f"{r['peak_kb']:>9} KB peak" if r['peak_kb'] is not None else ''
+            print(f"  {r['stage']:<28} {r['ms']:10.2f} ms {peak}")
+
+    report = {
+        'meta': {**metadata(), 'repeat': args.repeat, 'seed': args.seed},
+        'sizes': sizes,
+        'results': results,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            if compare(json.load(f), results):
+                sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
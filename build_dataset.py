@@ -0,0 +1,54 @@
+"""Compile the tracker CSV into the typed columnar artifact the dashboard loads.
+
+Writes data/compiled/<csv name>/ with commitments.parquet (the columns
+the dashboard reads: boolean flags, categoricals, parsed commitDate), one
+long-form child table per multi-valued field (type, themes, subthemes,
+entityType, entity, partners, countries), index.npz with the membership,
+country, search and cube arrays, and a manifest recording the CSV and FX
+table versions it was built from. Rows whose hand-filled amntUSD
+disagrees with their amnt converted at the FX table's rates are listed.
+The dashboard compiles on first load when the artifact is missing or
+stale; run this as part of a deploy to do it up front.
+
+    python build_dataset.py [--csv PATH] [--out DIR]
+"""
+import argparse
+import os
+import time
+
+import rddata
+
+
+def build(csv_path, out_dir):
+    start = time.perf_counter()
+    dataset = rddata.parse_csv(csv_path, rddata.source_version(csv_path))
+    parsed = time.perf_counter()
+    rddata.write_compiled(dataset, out_dir, source=csv_path)
+
+    start_read = time.perf_counter()
+    rddata.read_compiled(out_dir, dataset.version)
+    read = time.perf_counter()
+
+    size = sum(os.path.getsize(os.path.join(out_dir, f)) for f in os.listdir(out_dir))
+    print(f"Compiled {len(dataset.df)} commitments (version {dataset.version}) to {out_dir} ({size // 1024} KB)")
+    print(f"  parse CSV: {(parsed - start) * 1000:.1f} ms, load compiled: {(read - start_read) * 1000:.1f} ms")
+    for name, child in sorted(dataset.children.items()):
+        print(f"  {name}: {len(child)} rows, {child['key'].nunique()} distinct")
+    memory = rddata.memory_usage(dataset)
+    print(f"  in memory: {memory.pop('total') / 2**20:.1f} MB ("
+          + ', '.join(f"{name} {size / 2**20:.1f}" for name, size in memory.items()) + ")")
+
+    flagged = dataset.df[dataset.df['fxMismatch']]
+    if len(flagged):
+        print(f"{len(flagged)} rows' amntUSD disagree with amnt at the FX table rates:")
+        for _, row in flagged.iterrows():
+            print(f"  {row[rddata.ID_COLUMN]}  {row['amnt']!r}: amntUSD {row['amntUSD']:,.0f}, "
+                  f"converted {row['amntUSDcalc']:,.0f}")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=rddata.CSV_PATH)
+    parser.add_argument('--out', default=None, help='artifact directory (default: data/compiled/<csv name>)')
+    args = parser.parse_args()
+    build(args.csv, args.out or rddata.compiled_path(args.csv))
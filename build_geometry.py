@@ -0,0 +1,48 @@
+"""Build the bundled Africa boundary file used by the dashboard map.
+
+Reads a world country boundaries dataset (by default the Natural Earth 110m
+GeoJSON the dashboard used to fetch at runtime), keeps Africa, simplifies the
+outlines, attaches the tracker country name as the join key and writes a
+reduced-precision GeoJSON to data/africa.geojson.
+
+    python build_geometry.py [--source PATH_OR_URL] [--out PATH]
+"""
+import argparse
+import os
+
+import geopandas as gpd
+
+import rdgeo
+
+WORLD_URL = "https://raw.githubusercontent.com/datasets/geo-boundaries-world-110m/master/countries.geojson"
+
+
+def build(source, out, tolerance=0.05, precision=3):
+    world = gpd.read_file(source)
+    africa = world[world['continent'] == 'Africa'].copy()
+    if 'geounit' not in africa.columns:
+        africa['geounit'] = africa['name']
+    africa['country'] = [rdgeo.country_key(g) or rdgeo.country_key(n)
+                         for g, n in zip(africa['geounit'], africa['name'])]
+    africa['geometry'] = africa.geometry.simplify(tolerance, preserve_topology=True)
+    africa = africa[['geounit', 'name', 'country', 'geometry']].reset_index(drop=True)
+
+    os.makedirs(os.path.dirname(out) or '.', exist_ok=True)
+    if os.path.exists(out):
+        os.remove(out)
+    africa.to_file(out, driver='GeoJSON', COORDINATE_PRECISION=precision)
+
+    unmatched = sorted(set(rdgeo.african_countries) - set(africa['country'].dropna()))
+    print(f"Wrote {len(africa)} countries to {out} ({os.path.getsize(out) // 1024} KB)")
+    if unmatched:
+        print("No boundary in source for: " + ", ".join(unmatched))
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--source', default=WORLD_URL)
+    parser.add_argument('--out', default=rdgeo.GEOMETRY_PATH)
+    parser.add_argument('--tolerance', type=float, default=0.05, help='simplification tolerance in degrees')
+    parser.add_argument('--precision', type=int, default=3, help='coordinate decimal places')
+    args = parser.parse_args()
+    build(args.source, args.out, args.tolerance, args.precision)
@@ -0,0 +1,262 @@
+"""Export the dashboard as a static site that needs no per-view compute.
+
+Writes DIR/index.html (the default, unfiltered view) and, with --top N, a
+pre-rendered page for each of the N filter combinations most used in the
+dashboard's log (listed in DIR/views.json). Every page carries the map,
+pies, funding bar and all commitment cards, with the first page of its
+view showing. Changing a filter re-filters and re-aggregates in the browser
+over a compact index (DIR/data.js), so the site can be served from a CDN or
+any plain file server and embedded with an iframe like index_old.html.
+
+    python export_snapshot.py [--out DIR] [--top N] [--csv PATH] [--plotlyjs file|cdn]
+"""
+import argparse
+import hashlib
+import html
+import json
+import os
+import shutil
+from collections import Counter
+
+import numpy as np
+import plotly
+from plotly.offline import get_plotlyjs_version
+
+import rdcards
+import rddata
+import rdfigures
+import rdgeo
+import rdicons
+import rdlog
+import rdsearch
+
+OUT_DIR = 'site'
+SCRIPT_PATH = 'snapshot/snapshot.js'
+PAGE_SIZE = 25
+DEFAULT_SELECTION = ('', 'All', 'All', 'All', 'All', 'All')
+
+# sidebar label of each filter, in selection order after the search text
+filter_labels = {
+    'type': "Type of Commitment",
+    'themes': "Topic theme",
+    'subthemes': "Topic subtheme",
+    'entityType': "Type of entity making commitment",
+    'entity': "Entity making commitment",
+}
+
+PAGE_CSS = """
+    body { display: flex; margin: 0; }
+    .sidebar { width: 260px; flex-shrink: 0; padding: 20px; background-color: #f0f2f6; min-height: 100vh; }
+    .sidebar label { display: block; margin-top: 15px; font-size: 0.9em; }
+    .sidebar select, .sidebar input { width: 100%; padding: 5px; margin-top: 5px; }
+    main { flex: 1; padding: 20px 40px; min-width: 0; }
+    .row { display: flex; gap: 20px; }
+    .row > div { flex: 1; min-width: 0; }
+    .row > .wide { flex: 1.5; }
+    .pager { display: flex; gap: 20px; align-items: center; margin-bottom: 15px; }
+    .commitment { margin-bottom: 20px; }
+    details > summary { list-style: none; }
+"""
+
+
+def script_json(value):
+    """JSON safe to inline in a <script> element."""
+    return json.dumps(value, separators=(',', ':')).replace('</', '<\\/')
+
+
+def compact_index(dataset):
+    """What the browser needs to filter and aggregate: option rows, countries, amounts, search tokens."""
+    df = dataset.df
+    options = {'type': rddata.typelist, 'themes': rddata.themelist, **dataset.options}
+    # each row's tokens per search field, tokenised as rdsearch does, so the browser can rank the same way
+    text = {column: rdsearch.normalize(df[column]).str.findall(rdsearch.TOKEN_PATTERN).str.join(' ').tolist()
+            for column in rdsearch.search_fields if column in df.columns}
+    return {
+        'version': dataset.version,
+        'options': options,
+        'members': {column: [np.flatnonzero(dataset.has(column, v)).tolist() for v in values]
+                    for column, values in options.items()},
+        'countries': rdgeo.african_countries,
+        'rowCountries': [np.flatnonzero(row).tolist() for row in dataset.countries.to_numpy()],
+        'amounts': df['amntUSD'].round(2).tolist(),
+        'text': text,
+        'searchWeights': {column: rdsearch.search_fields[column] for column in text},
+        'pageSize': PAGE_SIZE,
+    }
+
+
+def common_selections(top, log_path=rdlog.LOG_PATH):
+    """The top most frequent non-default sidebar selections in the rerun log (and its backups)."""
+    counts = Counter()
+    for path in [log_path] + [f"{log_path}.{i}" for i in range(1, 4)]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    # the browser filters by the sidebar's choices but not by date
+                    if (entry.get('msg') == 'rerun' and entry.get('selection')
+                            and rddata.date_range(entry['selection']) == (None, None)):
+                        counts[tuple(entry['selection'])] += 1
+        except OSError:
+            continue
+    counts.pop(DEFAULT_SELECTION, None)
+    return counts.most_common(top)
+
+
+def page_name(selection):
+    if tuple(selection) == DEFAULT_SELECTION:
+        return 'index.html'
+    return f"view-{hashlib.sha1(json.dumps(list(selection)).encode()).hexdigest()[:10]}.html"
+
+
+def build_figures(dataset, view, geo_url):
+    figures = rdfigures.build_figures(dataset, view, geo_url, 'count', cache=None)
+    figures['map_count'] = figures.pop('map')
+    figures['map_usd'] = rdfigures.build_map(geo_url, view['country_funding'], 'usd')
+    del figures['timeline']  # not re-aggregated in the browser, so not shown
+    specs = {name: json.loads(fig.to_json()) for name, fig in figures.items()}
+    # the (large, identical) default template is shipped once in data.js
+    template = None
+    for spec in specs.values():
+        template = spec['layout'].pop('template', template)
+    return specs, template
+
+
+def render_page(dataset, selection, view, cards, figures, plotly_src):
+    options = {'type': rddata.typelist, 'themes': rddata.themelist, **dataset.options}
+    filters = []
+    for (column, label), value in zip(filter_labels.items(), selection[1:]):
+        choices = ''.join(f'<option{" selected" if v == value else ""}>{html.escape(str(v))}</option>'
+                          for v in ["All"] + list(options[column]))
+        filters.append(f'<label>{label}<select id="filter-{column}">{choices}</select></label>')
+
+    rows = [int(r) for r in view['rows']]
+    shown = set(rows[:PAGE_SIZE])
+    order = rows + sorted(set(cards) - set(rows))
+    card_html = '\n'.join(f'<div class="commitment" id="card-{r}" data-row="{r}"{"" if r in shown else " hidden"}>'
+                          f'{cards[r]}</div>' for r in order)
+    showing = (f"Showing 1-{len(shown)} of {len(rows)}" if rows else "No commitments match the filter criteria.")
+    pies = ''.join(f"""
+            <div><div class='pie-chart-title under-titles'>{title}</div><div id="fig-{name}"></div></div>"""
+                   for name, title in [('type', 'COMMITMENT TYPES:'), ('theme', 'COMMITMENT THEMES:'),
+                                       ('entType', 'COMMITTING ENTITIES:')])
+    metrics = ''.join(f'<label><input type="radio" name="map-metric" value="{metric}"'
+                      f'{" checked" if metric == "count" else ""}> {label}</label> '
+                      for label, metric in rdfigures.MAP_METRICS.items())
+    page_view = {'selection': list(selection), 'rows': rows, 'figures': figures}
+
+    return f"""<!DOCTYPE html>
+<html lang="en">
+<head>
+    <meta charset="utf-8">
+    <meta name="viewport" content="width=device-width, initial-scale=1">
+    <title>R&amp;D Commitments Tracker</title>
+    <style>{rdcards.CSS}{PAGE_CSS}</style>
+</head>
+<body>
+    <aside class="sidebar">
+        <h2>Filter Commitments</h2>
+        {''.join(filters[:3])}
+        <hr>
+        {''.join(filters[3:])}
+        <hr>
+        <label>Search<input id="search" type="search" value="{html.escape(selection[0])}"></label>
+    </aside>
+    <main>
+        <h1>R&amp;D Commitments Tracker</h1>
+        <a class="submit-button" href="{rdcards.FORM_URL}" target="_blank">SUBMIT INFORMATION ON A COMMITMENT</a>
+        <div class="row">
+            <div class="wide">
+                <div class="under-titles"> COUNTRIES: </div>
+                {metrics}
+                <div id="fig-map"></div>
+            </div>
+            <div>
+                <div class="commitment-header">
+                    <div class='under-titles'> NUMBER OF COMMITMENTS LOGGED: <br></div>
+                    <div class='big-number' id="total-commitments">{view['total_commitments']}</div>
+                </div>
+                <div class='under-titles'> <br>FUNDING COMMITTED: </div>
+                <div id="fig-money"></div>
+            </div>
+        </div>
+        <div class="row">{pies}
+        </div>
+        <hr>
+        <h2>List of commitments:</h2>
+        <div class="pager">
+            <button id="prev" disabled>Previous</button>
+            <span id="showing" class="under-titles">{showing}</span>
+            <button id="next"{"" if len(rows) > PAGE_SIZE else " disabled"}>Next</button>
+        </div>
+        <div id="cards">
+{card_html}
+        </div>
+    </main>
+    <script src="{plotly_src}"></script>
+    <script src="data.js"></script>
+    <script>window.RDVIEW = {script_json(page_view)};</script>
+    <script src="snapshot.js"></script>
+</body>
+</html>
+"""
+
+
+def export(out_dir, csv_path, top=0, plotlyjs='file'):
+    dataset = rddata.load_dataset(csv_path)
+    tmp = out_dir + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+
+    icons = rdicons.IconRegistry(static=True, static_dir=os.path.join(tmp, 'icons'), static_url='icons')
+    with open(rdgeo.GEOMETRY_PATH, 'rb') as f:
+        geometry = f.read()
+    geo_url = f"africa-{hashlib.sha256(geometry).hexdigest()[:12]}.geojson"
+    with open(os.path.join(tmp, geo_url), 'wb') as f:
+        f.write(geometry)
+    shutil.copyfile(SCRIPT_PATH, os.path.join(tmp, 'snapshot.js'))
+    if plotlyjs == 'cdn':
+        plotly_src = f"https://cdn.plot.ly/plotly-{get_plotlyjs_version()}.min.js"
+    else:
+        plotly_src = 'plotly.min.js'
+        shutil.copyfile(os.path.join(os.path.dirname(plotly.__file__), 'package_data', 'plotly.min.js'),
+                        os.path.join(tmp, plotly_src))
+
+    # card markup for every commitment, by row position
+    cards = dict(enumerate(rdcards.render_cards(dataset.df, icons, details=True)))
+    index = compact_index(dataset)
+    pages = [(DEFAULT_SELECTION, None)] + common_selections(top)
+    listed = []
+    for selection, hits in pages:
+        view = rddata.compute_view(dataset, selection)
+        figures, template = build_figures(dataset, view, geo_url)
+        index['template'] = template
+        name = page_name(selection)
+        with open(os.path.join(tmp, name), 'w', encoding='utf-8') as f:
+            f.write(render_page(dataset, selection, view, cards, figures, plotly_src))
+        listed.append({'selection': list(selection), 'page': name, 'hits': hits})
+    with open(os.path.join(tmp, 'data.js'), 'w', encoding='utf-8') as f:
+        f.write(f"window.RDDATA = {script_json(index)};\n")
+    with open(os.path.join(tmp, 'views.json'), 'w') as f:
+        json.dump(listed, f, indent=2)
+
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+    size = sum(os.path.getsize(os.path.join(out_dir, name)) for name in os.listdir(out_dir)
+               if os.path.isfile(os.path.join(out_dir, name)))
+    print(f"Exported {len(listed)} pages of {len(dataset.df)} commitments (version {dataset.version}) "
+          f"to {out_dir} ({size // 1024} KB)")
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--out', default=OUT_DIR)
+    parser.add_argument('--csv', default=rddata.CSV_PATH)
+    parser.add_argument('--top', type=int, default=0, help='also pre-render the N most used filter combinations')
+    parser.add_argument('--plotlyjs', choices=['file', 'cdn'], default='file',
+                        help='bundle plotly.min.js (default) or load it from the Plotly CDN')
+    args = parser.parse_args()
+    export(args.out, args.csv, args.top, args.plotlyjs)
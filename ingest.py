@@ -0,0 +1,59 @@
+"""Publish a delta file of new or corrected commitments to the dashboard.
+
+Validates DELTA (CSV, JSON lines or a JSON array of rows, with the tracker
+CSV's column names) against the schema and the data currently published,
+then copies it into data/deltas/<csv name>/. Every dashboard process picks
+it up on its next rerun and patches its loaded data instead of reloading
+the tracker.
+
+A row carrying a commitmentId (shown under each card's details), or with
+the entity, commName and date of an existing commitment, updates that
+commitment; fields left blank keep their value. Any other row is added as
+a new commitment and must fill entity, entityType, commName, type and date.
+Once the changes have been folded into the tracker CSV, delete its deltas.
+
+    python ingest.py DELTA [--csv PATH] [--check]
+"""
+import argparse
+import os
+import shutil
+import sys
+import time
+
+import rddata
+
+
+def publish(delta_path, csv_path, check=False):
+    dataset = rddata.load_dataset(csv_path)
+    delta = rddata.read_delta(delta_path)
+    problems = rddata.validate_delta(dataset, delta)
+    if problems:
+        print(f"{delta_path} was not published:")
+        for problem in problems:
+            print(f"  {problem}")
+        return 1
+
+    known = rddata.delta_ids(delta).isin(dataset.df[rddata.ID_COLUMN])
+    print(f"{delta_path}: {int(known.sum())} updated, {int((~known).sum())} new commitments")
+    if check:
+        return 0
+
+    out_dir = rddata.delta_path(csv_path)
+    os.makedirs(out_dir, exist_ok=True)
+    ext = os.path.splitext(delta_path)[1].lower()
+    name = f"{time.strftime('%Y%m%dT%H%M%S', time.gmtime())}-{rddata.content_hash(delta_path)[:8]}{ext}"
+    # copied under a name the dashboard ignores, then renamed into place
+    tmp = os.path.join(out_dir, name + '.tmp')
+    shutil.copyfile(delta_path, tmp)
+    os.replace(tmp, os.path.join(out_dir, name))
+    print(f"Published as {os.path.join(out_dir, name)}")
+    return 0
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('delta', help='CSV, JSONL or JSON file of new or corrected commitments')
+    parser.add_argument('--csv', default=rddata.CSV_PATH)
+    parser.add_argument('--check', action='store_true', help='validate only, do not publish')
+    args = parser.parse_args()
+    sys.exit(publish(args.delta, args.csv, args.check))
@@ -0,0 +1,585 @@
+"""Load-test the running dashboard with many simultaneous simulated viewers.
+
+Each simulated session talks to Streamlit the way a browser tab does, over
+the websocket at /_stcore/stream, but without a browser: it asks for a
+rerun with the widget values a reader would set, reads the messages of the
+run until the script reports it has finished, and learns the widgets it
+can set next (their ids, options, form and fragment) from the elements the
+run sent. Only the app's own server is contacted; the map boundaries, icons
+and data are all bundled with the app, so nothing is fetched from outside.
+
+Sessions replay an interaction trace: a list of steps, each named after
+the kind of interaction and setting some widgets by label, e.g.
+
+    [{"name": "type", "set": {"Type of Commitment": "*"}},
+     {"name": "page", "set": {"Page": 3}}]
+
+A value of "*" picks a random choice each time (an option other than
+"All", a search term from SEARCH_TERMS, a date range, a page, or flipping
+a toggle). Widgets in the filter form are applied by also pressing its
+submit button, and widgets in a fragment rerun just that fragment, as in
+the browser. The default trace (DEFAULT_TRACE) covers loading the page,
+the sidebar filters and search, the chart radios, paging and opening a
+card; --from-log replaces its filter steps with the most common
+selections in the rerun log, picked in proportion to how often they ran.
+
+Sessions start spread over --ramp seconds and each loops over the trace
+in a new session (a new viewer) until --duration is up, pausing a random
+think time between steps. Interactions are sent round-robin to the given
+servers (--url), or to --workers dashboard processes started here on
+ports from --port up (with --shared, attached to one loader's dataset; see
+rdshared), each logging to its own file so the test does not feed the
+production log.
+
+The report gives, per interaction type, the latency percentiles from
+sending the rerun to its end and to its first element, and the websocket
+bytes received and sent; and per worker process (spawned, or given with
+--pid), CPU use and resident and private memory sampled from /proc.
+
+    python loadtest.py [--sessions 10] [--duration 60] [--url ws://localhost:8501 | --workers 2 [--shared]]
+                       [--trace FILE] [--from-log N] [--out loadtest.json] [--compare BASE]
+"""
+import argparse
+import asyncio
+import datetime
+import json
+import os
+import random
+import statistics
+import subprocess
+import sys
+import tempfile
+import time
+import urllib.request
+from collections import Counter, defaultdict
+
+import numpy as np
+from streamlit.proto.BackMsg_pb2 import BackMsg
+from streamlit.proto.ForwardMsg_pb2 import ForwardMsg
+from streamlit.proto.WidgetStates_pb2 import WidgetState
+from tornado.websocket import websocket_connect
+
+import benchmark
+import rdlog
+
+DEFAULT_URL = 'ws://localhost:8501'
+DEFAULT_PORT = 8501
+STREAM_PATH = '/_stcore/stream'
+# the largest websocket message a session accepts (a figure with inlined geometry is several MB)
+MAX_MESSAGE_SIZE = 256 * 2**20
+
+# element types whose values a session can set
+WIDGET_TYPES = {'button', 'checkbox', 'date_input', 'number_input', 'radio', 'selectbox', 'text_input'}
+
+SEARCH_TERMS = ['vaccine', 'clinical trial', 'malaria', 'manufacturing', 'training', 'surveillance', 'genomics',
+                'covid', 'laboratory', 'funding']
+
+# sidebar label of each value of a selection (see rdpipeline.make_selection), the dates last
+selection_labels = ['Search', "Type of Commitment", "Topic theme", "Topic subtheme",
+                    "Type of entity making commitment", "Entity making commitment", "Commitment date"]
+
+FILTERS_RESET = {"Type of Commitment": "All", "Topic theme": "All", "Topic subtheme": "All",
+                 "Type of entity making commitment": "All", "Entity making commitment": "All",
+                 "Commitment date": "all", "Search": ""}
+
+DEFAULT_TRACE = [
+    {'name': 'load'},
+    {'name': 'type', 'set': {"Type of Commitment": "*"}},
+    {'name': 'theme', 'set': {"Topic theme": "*"}},
+    {'name': 'search', 'set': {"Search": "*"}},
+    {'name': 'dates', 'set': {"Commitment date": "*"}},
+    {'name': 'map_metric', 'set': {"Map shows": "*"}},
+    {'name': 'timeline_period', 'set': {"Timeline shows": "*"}},
+    {'name': 'reset', 'set': FILTERS_RESET},
+    {'name': 'entity_type', 'set': {"Type of entity making commitment": "*"}},
+    {'name': 'page', 'set': {"Page": "*"}},
+    {'name': 'page_size', 'set': {"Commitments per page": "*"}},
+    {'name': 'details', 'set': {"DETAILS": "*"}},
+    {'name': 'instant_mode', 'set': {"Apply filters as I change them": True}},
+    {'name': 'instant_subtheme', 'set': {"Topic subtheme": "*"}},
+]
+# steps that set the sidebar filters, which --from-log replaces with logged selections
+FILTER_STEPS = {'type', 'theme', 'search', 'dates', 'entity_type', 'instant_subtheme'}
+
+
+class Widget:
+    """A widget element of the last run: its type, proto and the fragment it belongs to ('' for none)."""
+
+    def __init__(self, kind, proto, fragment_id):
+        self.kind = kind
+        self.proto = proto
+        self.fragment_id = fragment_id
+
+    @property
+    def id(self):
+        return self.proto.id
+
+    @property
+    def form_id(self):
+        return self.proto.form_id
+
+
+def _day(value):
+    return datetime.datetime.strptime(value, '%Y/%m/%d').date()
+
+
+def widget_state(widget, value, current, rng):
+    """WidgetState setting widget to value ("*" for a random choice); current is its last state, if any."""
+    state = WidgetState(id=widget.id)
+    proto = widget.proto
+    if widget.kind in ('selectbox', 'radio'):
+        options = list(proto.options)
+        if value == '*':
+            value = rng.choice([o for o in options if o != 'All'] or options)
+        state.int_value = options.index(str(value))
+    elif widget.kind == 'text_input':
+        state.string_value = rng.choice(SEARCH_TERMS) if value == '*' else value
+    elif widget.kind == 'date_input':
+        first, last = _day(proto.min), _day(proto.max)
+        if value == '*':
+            days = sorted(rng.sample(range((last - first).days + 1), 2))
+            value = [first + datetime.timedelta(days=d) for d in days]
+        elif value == 'all':
+            value = [first, last]
+        else:
+            value = [datetime.date.fromisoformat(v) for v in value if v]
+        state.string_array_value.data.extend(d.strftime('%Y/%m/%d') for d in value)
+    elif widget.kind == 'number_input':
+        if value == '*':
+            low = int(proto.min) if proto.has_min else 1
+            high = int(proto.max) if proto.has_max else low + 10
+            value = rng.randint(low, max(low, high))
+        if proto.data_type == proto.INT:
+            state.int_value = int(value)
+        else:
+            state.double_value = float(value)
+    elif widget.kind == 'checkbox':
+        if value == '*':
+            value = not (current.bool_value if current is not None else proto.default)
+        state.bool_value = bool(value)
+    else:
+        state.trigger_value = True
+    return state
+
+
+class Session:
+    """One simulated viewer: a websocket to the dashboard and the widgets and values it has seen."""
+
+    def __init__(self, url, rng):
+        self.url = url
+        self.rng = rng
+        self.ws = None
+        self.widgets = defaultdict(list)  # label -> [Widget] (several cards have a DETAILS toggle)
+        self.states = {}  # widget id -> WidgetState the session has set
+        self.cached = {}  # message hash -> ForwardMsg, for messages the server sends by reference
+        self.page_script_hash = ''
+
+    async def connect(self):
+        self.ws = await websocket_connect(self.url.rstrip('/') + STREAM_PATH, subprotocols=['streamlit'],
+                                          max_message_size=MAX_MESSAGE_SIZE)
+
+    def close(self):
+        if self.ws is not None:
+            self.ws.close()
+
+    def find(self, label):
+        widgets = self.widgets.get(label)
+        if not widgets:
+            raise LookupError(f"no widget labelled {label!r} in the last run")
+        return self.rng.choice(widgets)
+
+    async def step(self, values, timeout):
+        """Set widgets by label and rerun (the filter form's submit button pressed if any is in it).
+
+        Returns (ms to the end of the run, ms to its first element, bytes received, bytes sent, messages,
+        error or None).
+        """
+        widgets = [(self.find(label), value) for label, value in (values or {}).items()]
+        triggers = []
+        for widget, value in widgets:
+            state = widget_state(widget, value, self.states.get(widget.id), self.rng)
+            if state.WhichOneof('value') == 'trigger_value':
+                triggers.append(state)
+            else:
+                self.states[widget.id] = state
+        forms = {widget.form_id for widget, _ in widgets if widget.form_id}
+        for submit in (w for ws in self.widgets.values() for w in ws):
+            if submit.kind == 'button' and submit.proto.is_form_submitter and submit.form_id in forms:
+                triggers.append(WidgetState(id=submit.id, trigger_value=True))
+        fragments = {widget.fragment_id for widget, _ in widgets}
+        fragment_id = fragments.pop() if len(fragments) == 1 else ''
+
+        back = BackMsg()
+        back.rerun_script.page_script_hash = self.page_script_hash
+        back.rerun_script.fragment_id = fragment_id
+        back.rerun_script.widget_states.widgets.extend(list(self.states.values()) + triggers)
+        payload = back.SerializeToString()
+        start = time.perf_counter()
+        await self.ws.write_message(payload, binary=True)
+        try:
+            received, messages, first, error = await asyncio.wait_for(self._read_run(fragment_id, start), timeout)
+        except asyncio.TimeoutError:
+            return (time.perf_counter() - start) * 1000, None, None, len(payload), None, 'timeout'
+        return (time.perf_counter() - start) * 1000, first, received, len(payload), messages, error
+
+    async def _read_run(self, fragment_id, start):
+        """Read the run's messages up to script_finished: (bytes, messages, ms to first element, error)."""
+        if fragment_id:
+            for label, widgets in list(self.widgets.items()):
+                self.widgets[label] = [w for w in widgets if w.fragment_id != fragment_id]
+        else:
+            self.widgets.clear()
+        received = messages = 0
+        first = error = None
+        while True:
+            data = await self.ws.read_message()
+            if data is None:
+                return received, messages, first, 'connection closed'
+            received += len(data)
+            messages += 1
+            msg = ForwardMsg()
+            msg.ParseFromString(data)
+            if msg.WhichOneof('type') == 'ref_hash':
+                msg = self.cached[msg.ref_hash]
+            elif msg.metadata.cacheable:
+                self.cached[msg.hash] = msg
+            kind = msg.WhichOneof('type')
+            if kind == 'new_session':
+                self.page_script_hash = msg.new_session.page_script_hash
+            elif kind == 'delta' and msg.delta.WhichOneof('type') == 'new_element':
+                if first is None:
+                    first = (time.perf_counter() - start) * 1000
+                element = msg.delta.new_element
+                element_type = element.WhichOneof('type')
+                if element_type in WIDGET_TYPES:
+                    proto = getattr(element, element_type)
+                    self.widgets[proto.label].append(Widget(element_type, proto, msg.delta.fragment_id))
+                elif element_type == 'exception' and error is None:
+                    error = f"{element.exception.type}: {element.exception.message}"
+            elif kind == 'script_finished':
+                if msg.script_finished == ForwardMsg.FINISHED_WITH_COMPILE_ERROR:
+                    error = error or 'compile error'
+                return received, messages, first, error
+
+
+def logged_steps(top, log_path=rdlog.LOG_PATH):
+    """[(step, runs)] setting the sidebar to each of the top most common selections in the rerun log."""
+    counts = Counter()
+    for path in [log_path] + [f"{log_path}.{i}" for i in range(1, 4)]:
+        try:
+            with open(path, encoding='utf-8') as f:
+                for line in f:
+                    try:
+                        entry = json.loads(line)
+                    except ValueError:
+                        continue
+                    if entry.get('msg') == 'rerun' and entry.get('selection'):
+                        counts[tuple(entry['selection'])] += 1
+        except OSError:
+            continue
+    steps = []
+    for selection, runs in counts.most_common(top):
+        values = dict(zip(selection_labels, selection[:6]))
+        if len(selection) > 6:
+            values["Commitment date"] = list(selection[6:8])
+        steps.append(({'name': 'logged', 'set': {**FILTERS_RESET, **values}}, runs))
+    return steps
+
+
+def session_trace(trace, logged, rng):
+    """The steps one session replays: the trace, its filter steps replaced by logged selections if given."""
+    if not logged:
+        return trace
+    steps, weights = zip(*logged)
+    return [rng.choices(steps, weights)[0] if step['name'] in FILTER_STEPS else step for step in trace]
+
+
+async def simulate(number, urls, trace, logged, args, deadline, records):
+    """Session loop number: replay the trace in a new session after another until the deadline."""
+    rng = random.Random(args.seed + number)
+    await asyncio.sleep(args.ramp * number / args.sessions)
+    loop = 0
+    while time.monotonic() < deadline:
+        url = urls[(number + loop) % len(urls)]
+        session = Session(url, rng)
+        try:
+            await session.connect()
+            for i, step in enumerate(session_trace(trace, logged, rng)):
+                if time.monotonic() >= deadline:
+                    break
+                try:
+                    ms, first, received, sent, messages, error = await session.step(step.get('set'), args.timeout)
+                except LookupError as e:
+                    ms, first, received, sent, messages, error = None, None, None, None, None, str(e)
+                records.append({'session': number, 'loop': loop, 'step': i, 'name': step['name'], 'url': url,
+                                'ms': ms, 'first_ms': first, 'bytes': received, 'sent': sent,
+                                'messages': messages, 'error': error})
+                if error in ('timeout', 'connection closed'):
+                    break
+                await asyncio.sleep(rng.expovariate(1 / args.think) if args.think else 0)
+        except OSError as e:
+            records.append({'session': number, 'loop': loop, 'step': None, 'name': 'connect', 'url': url,
+                            'error': f"{type(e).__name__}: {e}"})
+            await asyncio.sleep(1)
+        finally:
+            session.close()
+        loop += 1
+
+
+def proc_sample(pid):
+    """(CPU seconds, resident bytes) of a process, or None once it has exited."""
+    try:
+        with open(f'/proc/{pid}/stat') as f:
+            fields = f.read().rsplit(')', 1)[1].split()
+        with open(f'/proc/{pid}/statm') as f:
+            resident = int(f.read().split()[1]) * os.sysconf('SC_PAGE_SIZE')
+    except OSError:
+        return None
+    return (int(fields[11]) + int(fields[12])) / os.sysconf('SC_CLK_TCK'), resident
+
+
+def proc_memory(pid):
+    """{'pss', 'private'} bytes of a process (private excludes pages it shares with others)."""
+    memory = {}
+    try:
+        with open(f'/proc/{pid}/smaps_rollup') as f:
+            for line in f:
+                name, _, value = line.partition(':')
+                if name in ('Pss', 'Private_Clean', 'Private_Dirty'):
+                    memory[name] = int(value.split()[0]) * 1024
+    except OSError:
+        return {}
+    return {'pss': memory.get('Pss'), 'private': memory.get('Private_Clean', 0) + memory.get('Private_Dirty', 0)}
+
+
+async def monitor(pids, interval, stop, samples):
+    """Sample each pid's CPU and resident memory every interval seconds until stop is set."""
+    last = {pid: (time.monotonic(), proc_sample(pid)) for pid in pids}
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        for pid in pids:
+            now, sample = time.monotonic(), proc_sample(pid)
+            before, previous = last[pid]
+            if sample is None or previous is None:
+                continue
+            samples[pid].append({'cpu_percent': 100 * (sample[0] - previous[0]) / (now - before),
+                                 'rss': sample[1]})
+            last[pid] = (now, sample)
+
+
+def worker_report(name, pid, samples, started):
+    cpu = [s['cpu_percent'] for s in samples]
+    rss = [s['rss'] for s in samples]
+    end = proc_sample(pid)
+    return {
+        'name': name,
+        'pid': pid,
+        'cpu_seconds': round(end[0] - started[0], 2) if end and started else None,
+        'cpu_percent_mean': round(statistics.mean(cpu), 1) if cpu else None,
+        'cpu_percent_max': round(max(cpu), 1) if cpu else None,
+        'rss_mean_mb': round(statistics.mean(rss) / 2**20, 1) if rss else None,
+        'rss_max_mb': round(max(rss) / 2**20, 1) if rss else None,
+        **{f'{k}_mb': round(v / 2**20, 1) for k, v in proc_memory(pid).items() if v is not None},
+    }
+
+
+def summarize(records):
+    """Per interaction type: counts, errors, latency percentiles and payload sizes."""
+    by_name = defaultdict(list)
+    for r in records:
+        by_name[r['name']].append(r)
+    summary = []
+    for name, rs in by_name.items():
+        ok = [r for r in rs if r['error'] is None and r.get('ms') is not None]
+        ms = [r['ms'] for r in ok]
+        first = [r['first_ms'] for r in ok if r['first_ms'] is not None]
+        received = [r['bytes'] for r in ok]
+        p50, p95, p99 = np.percentile(ms, [50, 95, 99]) if ms else (None,) * 3
+        summary.append({
+            'name': name,
+            'count': len(rs),
+            'errors': len(rs) - len(ok),
+            'p50_ms': _round(p50), 'p95_ms': _round(p95), 'p99_ms': _round(p99),
+            'max_ms': _round(max(ms)) if ms else None,
+            'first_p50_ms': _round(np.percentile(first, 50)) if first else None,
+            'bytes_mean': round(statistics.mean(received)) if received else None,
+            'bytes_max': max(received) if received else None,
+            'sent_mean': round(statistics.mean([r['sent'] for r in ok])) if ok else None,
+            'messages_mean': round(statistics.mean([r['messages'] for r in ok]), 1) if ok else None,
+        })
+    return summary
+
+
+def _round(value):
+    return None if value is None else round(float(value), 2)
+
+
+def wait_healthy(port, proc, timeout):
+    """Wait for a spawned worker's health check to answer; raises if it exits or times out."""
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if proc.poll() is not None:
+            raise RuntimeError(f"worker on port {port} exited with status {proc.returncode}")
+        try:
+            with urllib.request.urlopen(f'http://127.0.0.1:{port}/_stcore/health', timeout=2) as response:
+                if response.status == 200:
+                    return
+        except OSError:
+            pass
+        time.sleep(0.5)
+    raise RuntimeError(f"worker on port {port} did not come up within {timeout:.0f} s")
+
+
+def start_workers(n, port, shared, log_dir, timeout):
+    """Start n dashboard processes (serve.py) on ports from port up: [(name, Popen)], loader first if shared."""
+    here = os.path.dirname(os.path.abspath(__file__))
+    env = {**os.environ, 'STREAMLIT_SERVER_HEADLESS': 'true', 'STREAMLIT_BROWSER_GATHER_USAGE_STATS': 'false'}
+    env.pop('RDDASH_SHARED', None)
+    procs = []
+    if shared:
+        start = time.perf_counter()
+        subprocess.run([sys.executable, os.path.join(here, 'rdshared.py')], cwd=here, check=True,
+                       env={**env, 'RDDASH_LOG_PATH': os.path.join(log_dir, 'loader.log')})
+        print(f"Published the shared dataset in {time.perf_counter() - start:.1f} s")
+        env['RDDASH_SHARED'] = '1'
+    for i in range(n):
+        name = f'worker-{port + i}'
+        out = open(os.path.join(log_dir, f'{name}.out'), 'w')
+        proc = subprocess.Popen([sys.executable, os.path.join(here, 'serve.py'), '--port', str(port + i)],
+                                cwd=here, stdout=out, stderr=subprocess.STDOUT,
+                                env={**env, 'RDDASH_LOG_PATH': os.path.join(log_dir, f'{name}.log')})
+        procs.append((name, proc))
+    start = time.perf_counter()
+    for i, (name, proc) in enumerate(procs):
+        wait_healthy(port + i, proc, timeout)
+    print(f"{n} worker(s) up in {time.perf_counter() - start:.1f} s (logs in {log_dir})")
+    return procs
+
+
+def stop_workers(procs):
+    for _, proc in procs:
+        proc.terminate()
+    for _, proc in procs:
+        try:
+            proc.wait(10)
+        except subprocess.TimeoutExpired:
+            proc.kill()
+
+
+async def run(urls, pids, trace, logged, args):
+    records = []
+    samples = {pid: [] for pid in pids.values()}
+    started = {pid: proc_sample(pid) for pid in pids.values()}
+    stop = asyncio.Event()
+    sampler = asyncio.create_task(monitor(list(samples), args.sample, stop, samples))
+    start = time.monotonic()
+    deadline = start + args.ramp + args.duration
+    await asyncio.gather(*(simulate(i, urls, trace, logged, args, deadline, records) for i in range(args.sessions)))
+    elapsed = time.monotonic() - start
+    stop.set()
+    await sampler
+    workers = [worker_report(name, pid, samples[pid], started[pid]) for name, pid in pids.items()]
+    return records, workers, elapsed
+
+
+def compare(base, summary):
+    """Print p95 latency ratios per interaction against a baseline run; returns the slower interactions."""
+    before = {s['name']: s['p95_ms'] for s in base['summary']}
+    slower = []
+    print(f"\nCompared with {base['meta'].get('commit')} ({base['meta'].get('timestamp')}):")
+    for s in summary:
+        old = before.get(s['name'])
+        if not old or s['p95_ms'] is None:
+            continue
+        ratio = s['p95_ms'] / old
+        flag = '  SLOWER' if ratio > benchmark.REGRESSION_RATIO else ''
+        print(f"  {s['name']:<18} p95 {old:10.1f} -> {s['p95_ms']:10.1f} ms  x{ratio:.2f}{flag}")
+        if flag:
+            slower.append(s)
+    return slower
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--sessions', type=int, default=10, help='simultaneous simulated viewers')
+    parser.add_argument('--duration', type=float, default=60, help='seconds to run after the ramp-up')
+    parser.add_argument('--ramp', type=float, default=10, help='seconds over which the sessions start')
+    parser.add_argument('--think', type=float, default=1.0, help='mean pause between steps, in seconds')
+    parser.add_argument('--timeout', type=float, default=60, help='seconds to wait for one rerun')
+    parser.add_argument('--url', action='append', help=f'dashboard to test (repeatable; default {DEFAULT_URL})')
+    parser.add_argument('--pid', type=int, action='append', default=[], help='server process to sample (repeatable)')
+    parser.add_argument('--workers', type=int, help='start this many dashboard processes instead of using --url')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT, help='first port of the started workers')
+    parser.add_argument('--shared', action='store_true', help='started workers attach to one shared dataset')
+    parser.add_argument('--startup', type=float, default=300, help='seconds to wait for started workers')
+    parser.add_argument('--trace', help='JSON list of steps to replay instead of DEFAULT_TRACE')
+    parser.add_argument('--from-log', type=int, metavar='N', help="replay the log's N most common selections")
+    parser.add_argument('--sample', type=float, default=1.0, help='seconds between CPU and memory samples')
+    parser.add_argument('--seed', type=int, default=0)
+    parser.add_argument('--out', default='loadtest.json', help='where to save the results as JSON')
+    parser.add_argument('--compare', help='results JSON of an earlier run to compare with')
+    args = parser.parse_args()
+
+    trace = DEFAULT_TRACE
+    if args.trace:
+        with open(args.trace) as f:
+            trace = json.load(f)
+    logged = logged_steps(args.from_log) if args.from_log else None
+    if args.from_log and not logged:
+        print(f"No selections in {rdlog.LOG_PATH}; replaying the default filter steps")
+
+    procs = []
+    log_dir = tempfile.mkdtemp(prefix='rdloadtest-')
+    try:
+        if args.workers:
+            procs = start_workers(args.workers, args.port, args.shared, log_dir, args.startup)
+            urls = [f'ws://127.0.0.1:{args.port + i}' for i in range(args.workers)]
+            pids = {name: proc.pid for name, proc in procs}
+        else:
+            urls = args.url or [DEFAULT_URL]
+            pids = {f'pid-{pid}': pid for pid in args.pid}
+        print(f"{args.sessions} sessions against {', '.join(urls)} for {args.ramp:.0f} + {args.duration:.0f} s")
+        records, workers, elapsed = asyncio.run(run(urls, pids, trace, logged, args))
+    finally:
+        stop_workers(procs)
+
+    summary = summarize(records)
+    done = sum(1 for r in records if r['error'] is None)
+    print(f"{done} interactions in {elapsed:.1f} s ({done / elapsed:.1f}/s), "
+          f"{len(records) - done} failed")
+    print(f"  {'interaction':<18} {'count':>6} {'errors':>6} {'p50':>9} {'p95':>9} {'p99':>9} {'first p50':>10} "
+          f"{'KB recv':>9} {'msgs':>6}")
+    for s in summary:
+        ms = ' '.join(f"{v:9.1f}" if v is not None else f"{'-':>9}" for v in (s['p50_ms'], s['p95_ms'], s['p99_ms']))
+        first = f"{s['first_p50_ms']:10.1f}" if s['first_p50_ms'] is not None else f"{'-':>10}"
+        kb = f"{s['bytes_mean'] / 1024:9.1f}" if s['bytes_mean'] is not None else f"{'-':>9}"
+        msgs = f"{s['messages_mean']:6.1f}" if s['messages_mean'] is not None else f"{'-':>6}"
+        print(f"  {s['name']:<18} {s['count']:>6} {s['errors']:>6} {ms} {first} {kb} {msgs}")
+    errors = Counter(r['error'] for r in records if r['error'])
+    for error, count in errors.most_common(5):
+        print(f"  {count} x {error}")
+    for w in workers:
+        print(f"  {w['name']}: CPU {w['cpu_seconds']} s (mean {w['cpu_percent_mean']}%, max {w['cpu_percent_max']}%), "
+              f"RSS mean {w['rss_mean_mb']} MB, max {w['rss_max_mb']} MB, private {w.get('private_mb')} MB")
+
+    report = {
+        'meta': {**benchmark.metadata(), 'sessions': args.sessions, 'duration': args.duration, 'ramp': args.ramp,
+                 'think': args.think, 'urls': urls, 'workers': args.workers, 'shared': args.shared,
+                 'trace': trace, 'from_log': args.from_log, 'seed': args.seed, 'elapsed': round(elapsed, 2)},
+        'summary': summary,
+        'workers': workers,
+        'interactions': records,
+    }
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2)
+    print(f"Saved to {args.out}")
+    if args.compare:
+        with open(args.compare) as f:
+            compare(json.load(f), summary)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,263 @@
+"""Read-only JSON API over the loaded tracker.
+
+Answers the same filters as the sidebar from the same Dataset, indexes and
+filter cache as the dashboard (see rdpipeline), so partners can fetch
+filtered commitments and the chart aggregates without driving a Streamlit
+rerun:
+
+    GET /options                   sidebar choices
+    GET /commitments?...           one page of matching commitments
+    GET /aggregates?...            the numbers behind the charts
+    GET /health                    200 once the process is warm, else 503
+
+Filters are type, theme, subtheme, entityType, entity, search, and from
+and to (commitment dates like 2024-01-31, both days included); paging is
+page (from 1) and page_size (up to MAX_PAGE_SIZE). /aggregates includes
+commitments and USD per month and per quarter. Every response
+carries the dataset version as its ETag, so a client sending it back in
+If-None-Match gets a bodyless 304 until the data changes.
+
+Run it on its own (python rdapi.py [--port 8600] [--csv PATH]) or inside
+the dashboard process by setting RDDASH_API_PORT, which shares that
+process's loaded data and caches.
+"""
+import argparse
+import datetime
+import json
+import math
+import threading
+import time
+from http import HTTPStatus
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from urllib.parse import parse_qs, urlsplit
+
+import pandas as pd
+
+import rddata
+import rdgeo
+import rdlog
+import rdpipeline
+
+log = rdlog.get_logger('rddash.api')
+
+# clear of the dashboard workers' ports (8501 and up)
+DEFAULT_PORT = 8600
+MAX_PAGE_SIZE = 100
+
+# query parameter -> member column, in selection order after the search text
+filter_params = {
+    'type': 'type',
+    'theme': 'themes',
+    'subtheme': 'subthemes',
+    'entityType': 'entityType',
+    'entity': 'entity',
+}
+
+# fields of each commitment returned by /commitments
+record_columns = ['commitmentId', 'entity', 'entityType', 'partners', 'commName', 'type', 'themes', 'subthemes',
+                  'geography', 'amnt', 'amntUSD', 'details', 'src', 'link', 'upd', 'new']
+
+
+class BadRequest(ValueError):
+    pass
+
+
+def options(dataset):
+    return {'type': rddata.typelist, 'theme': rddata.themelist, 'subtheme': dataset.options['subthemes'],
+            'entityType': dataset.options['entityType'], 'entity': dataset.options['entity']}
+
+
+def parse_selection(dataset, query):
+    """Selection tuple for the query's filters; unknown filter values are a BadRequest."""
+    choices = options(dataset)
+    values = {}
+    for param, column in filter_params.items():
+        value = query.get(param, 'All')
+        if value != 'All':
+            known = {rddata.member_key(column, v): v for v in choices[param]}
+            if rddata.member_key(column, value) not in known:
+                raise BadRequest(f"unknown {param}: {value!r} (see /options)")
+            value = known[rddata.member_key(column, value)]
+        values[column] = value
+    dates = [parse_date(query, name) for name in ('from', 'to')]
+    return rdpipeline.make_selection(query.get('search', ''), dates=dates, **values)
+
+
+def parse_date(query, name):
+    if name not in query:
+        return None
+    try:
+        return datetime.date.fromisoformat(query[name])
+    except ValueError:
+        raise BadRequest(f"{name} must be a date like 2024-01-31") from None
+
+
+def parse_int(query, name, default, low, high):
+    try:
+        value = int(query.get(name, default))
+    except ValueError:
+        raise BadRequest(f"{name} must be an integer") from None
+    if not low <= value <= high:
+        raise BadRequest(f"{name} must be between {low} and {high}")
+    return value
+
+
+def _plain(value):
+    """JSON-safe value: None for missing, Python scalars for numpy ones."""
+    if value is None or value is pd.NA or (isinstance(value, float) and math.isnan(value)):
+        return None
+    return value.item() if hasattr(value, 'item') else value
+
+
+def commitments(dataset, query):
+    selection = parse_selection(dataset, query)
+    page_size = parse_int(query, 'page_size', rdpipeline.DEFAULT_PAGE_SIZE, 1, MAX_PAGE_SIZE)
+    view = rddata.cached_view(dataset, selection)
+    n_pages = rdpipeline.paginate(view['rows'], 1, page_size)[2]
+    page = parse_int(query, 'page', 1, 1, n_pages)
+    rows, start, _ = rdpipeline.paginate(view['rows'], page, page_size)
+
+    df = dataset.df
+    columns = [c for c in record_columns if c in df.columns]
+    page_df = df.iloc[rows]
+    countries = dataset.countries.iloc[rows]
+    records = []
+    for (_, row), covered in zip(page_df[columns].iterrows(), countries.to_numpy()):
+        record = {c: _plain(row[c]) for c in columns}
+        date = df.at[row.name, 'commitDate']
+        record['date'] = None if pd.isna(date) else date.strftime('%Y-%m-%d')
+        updated = df.at[row.name, 'updDate']
+        record['updated'] = None if pd.isna(updated) else updated.strftime('%Y-%m')
+        record['countries'] = [c for c, hit in zip(countries.columns, covered) if hit]
+        records.append(record)
+    return {'total': len(view['rows']), 'page': page, 'page_size': page_size, 'pages': n_pages,
+            'commitments': records}
+
+
+def aggregates(dataset, query):
+    view = rddata.cached_view(dataset, parse_selection(dataset, query))
+    return {
+        'total_commitments': view['total_commitments'],
+        'funding_usd': float(view['filtered_money_pledged']),
+        'types': dict(zip(rddata.typelist, view['type_counts'])),
+        'themes': dict(zip(rddata.themelist, view['theme_counts'])),
+        'entity_types': dict(zip(dataset.options['entityType'], view['entType_counts'])),
+        'countries': {country: {'commitments': int(count), 'funding_usd': float(usd)}
+                      for country, count, usd in zip(rdgeo.african_countries, view['country_counts'],
+                                                     view['country_funding'])},
+        'timeline': view['timeline'],
+    }
+
+
+routes = {
+    '/options': lambda dataset, query: options(dataset),
+    '/commitments': commitments,
+    '/aggregates': aggregates,
+}
+
+
+def etag_matches(header, etag):
+    if header is None:
+        return False
+    tags = [t.strip() for t in header.split(',')]
+    return '*' in tags or etag in tags or f"W/{etag}" in tags
+
+
+class Handler(BaseHTTPRequestHandler):
+    csv_path = rddata.CSV_PATH
+    server_version = 'rdapi'
+
+    def do_GET(self):
+        start = time.perf_counter()
+        url = urlsplit(self.path)
+        if url.path.rstrip('/') == '/health':
+            status = HTTPStatus.OK if rdpipeline.ready.is_set() else HTTPStatus.SERVICE_UNAVAILABLE
+            self.send_json(status, {'ready': status == HTTPStatus.OK, **rdpipeline.startup})
+            return self.log_request_time(url.path, status, start)
+        route = routes.get(url.path.rstrip('/') or '/')
+        if route is None:
+            self.send_json(HTTPStatus.NOT_FOUND, {'error': 'not found', 'endpoints': sorted(routes)})
+            return self.log_request_time(url.path, HTTPStatus.NOT_FOUND, start)
+
+        etag = None
+        try:
+            dataset = rddata.load_dataset(self.csv_path)
+            etag = f'"{dataset.version}"'
+            query = {name: values[-1] for name, values in parse_qs(url.query).items()}
+            # the route runs first, so a malformed query is a 400 even when the tag matches
+            body = {'version': dataset.version, **route(dataset, query)}
+            if etag_matches(self.headers.get('If-None-Match'), etag):
+                self.send_response(HTTPStatus.NOT_MODIFIED)
+                self.send_cache_headers(etag)
+                self.end_headers()
+                return self.log_request_time(url.path, HTTPStatus.NOT_MODIFIED, start)
+            status = HTTPStatus.OK
+        except BadRequest as e:
+            body, status = {'error': str(e)}, HTTPStatus.BAD_REQUEST
+        except Exception:
+            log.exception("API request failed", extra={'path': url.path, 'query': url.query})
+            body, status = {'error': 'internal error'}, HTTPStatus.INTERNAL_SERVER_ERROR
+        self.send_json(status, body, etag if status == HTTPStatus.OK else None)
+        self.log_request_time(url.path, status, start)
+
+    def send_cache_headers(self, etag):
+        self.send_header('ETag', etag)
+        # clients may keep responses but must revalidate them (cheaply, via If-None-Match)
+        self.send_header('Cache-Control', 'no-cache')
+        self.send_header('Access-Control-Allow-Origin', '*')
+
+    def send_json(self, status, body, etag=None):
+        payload = json.dumps(body, separators=(',', ':')).encode('utf-8')
+        self.send_response(status)
+        self.send_header('Content-Type', 'application/json; charset=utf-8')
+        self.send_header('Content-Length', str(len(payload)))
+        if etag is not None:
+            self.send_cache_headers(etag)
+        self.end_headers()
+        self.wfile.write(payload)
+
+    def log_request_time(self, path, status, start):
+        log.info('api', extra={'path': path, 'query': urlsplit(self.path).query, 'status': int(status),
+                               'ms': round((time.perf_counter() - start) * 1000, 2)})
+
+    def log_message(self, format, *args):
+        # requests are logged as JSON records by log_request_time
+        pass
+
+
+def make_server(host='', port=DEFAULT_PORT, csv_path=rddata.CSV_PATH):
+    handler = type('Handler', (Handler,), {'csv_path': csv_path})
+    server = ThreadingHTTPServer((host, port), handler)
+    server.daemon_threads = True
+    return server
+
+
+_lock = threading.Lock()
+_servers = {}  # port -> server started in this process
+
+
+def start(port=DEFAULT_PORT, host='', csv_path=rddata.CSV_PATH):
+    """Serve the API from a background thread of this process, once per port."""
+    with _lock:
+        if port not in _servers:
+            server = make_server(host, port, csv_path)
+            threading.Thread(target=server.serve_forever, name=f'rdapi-{port}', daemon=True).start()
+            _servers[port] = server
+            log.info("API listening on port %d", port)
+        return _servers[port]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--host', default='')
+    parser.add_argument('--port', type=int, default=DEFAULT_PORT)
+    parser.add_argument('--csv', default=rddata.CSV_PATH)
+    args = parser.parse_args()
+    server = make_server(args.host, args.port, args.csv)
+    # /health answers 503 until the warm-up is done
+    threading.Thread(target=rdpipeline.warm_up, args=(args.csv,), name='rdapi-warm-up', daemon=True).start()
+    print(f"Serving the tracker API on port {args.port}")
+    try:
+        server.serve_forever()
+    except KeyboardInterrupt:
+        pass
@@ -0,0 +1,112 @@
+"""Process-wide caches shared by all dashboard sessions.
+
+Like the loaded dataset, these live in an imported module so they survive
+Streamlit reruns and are shared by every session served by the process.
+"""
+import os
+import threading
+import time
+from collections import OrderedDict
+
+
+class LRUCache:
+    """Bounded, thread-safe LRU cache with an optional time-to-live.
+
+    hits/misses/evictions are kept so cache effectiveness can be reported.
+    """
+
+    def __init__(self, maxsize=128, ttl=None):
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+        self._data = OrderedDict()  # key -> (stored_at, value)
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        with self._lock:
+            item = self._data.get(key)
+            if item is not None and self.ttl is not None and time.monotonic() - item[0] > self.ttl:
+                del self._data[key]
+                item = None
+            if item is None:
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def put(self, key, value):
+        with self._lock:
+            self._data[key] = (time.monotonic(), value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def get_or_compute(self, key, compute):
+        """Cached value for key, calling compute() and storing it on a miss."""
+        missing = object()
+        value = self.get(key, missing)
+        if value is missing:
+            value = compute()
+            self.put(key, value)
+        return value
+
+    def rekey(self, func):
+        """Replace each entry by func(key, value) -> (key, value), or drop it if that is None.
+
+        Entries keep their age and recency order. Returns (kept, dropped).
+        """
+        with self._lock:
+            items = list(self._data.items())
+            self._data.clear()
+            for key, (stored_at, value) in items:
+                moved = func(key, value)
+                if moved is not None:
+                    self._data[moved[0]] = (stored_at, moved[1])
+            return len(self._data), len(items) - len(self._data)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': self.hits / lookups if lookups else 0.0,
+            }
+
+
+def _env_number(name, default, cast=int):
+    value = os.environ.get(name)
+    return cast(value) if value else default
+
+
+# Filter results and the aggregates derived from them, keyed by
+# (dataset version, normalised sidebar selection); see rddata.cached_view
+filter_cache = LRUCache(
+    maxsize=_env_number('RDDASH_FILTER_CACHE_SIZE', 256),
+    ttl=_env_number('RDDASH_FILTER_CACHE_TTL', 3600, float),
+)
+
+# Built Plotly figures, keyed by the aggregates they plot
+figure_cache = LRUCache(
+    maxsize=_env_number('RDDASH_FIGURE_CACHE_SIZE', 256),
+    ttl=_env_number('RDDASH_FIGURE_CACHE_TTL', None, float),
+)
+
+# Rendered card markup, keyed by (dataset version, commitment ID, card part,
+# static icons); see rdcards.render_cards
+card_cache = LRUCache(
+    maxsize=_env_number('RDDASH_CARD_CACHE_SIZE', 4096),
+    ttl=_env_number('RDDASH_CARD_CACHE_TTL', None, float),
+)
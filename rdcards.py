@@ -0,0 +1,446 @@
+"""Commitment card markup and the dashboard's CSS.
+
+Shared by the Streamlit app and the static snapshot export, so a card looks
+the same in both. Icons are looked up through an rdicons.IconRegistry,
+which decides whether they are inlined or served as files.
+"""
+import html
+import re
+
+import pandas as pd
+
+import rdcache
+from rddata import ID_COLUMN
+from rdicons import africa_icon, subtheme_icons, theme_icons, type_icons
+
+# Microsoft Forms link for submitting a new commitment or an update
+FORM_URL = 'https://forms.office.com/Pages/ResponsePage.aspx?id=Tz_KKWdtpUmgAeHbSCUnFy2BeXFp3KhHtfbSDqh1w0tUOU81T0NBUEZUMkFHMkdGTExTU0JLWEMwUS4u'
+
+CSS = """
+    @import url('https://fonts.googleapis.com/css2?family=Aptos:wght@400;600&display=swap');
+    
+    body {
+        font-family: 'Aptos', sans-serif;
+        background-color: #f7f7f7;
+    }
+    .link_button {
+        background-color: #ee6c4d;
+    }
+    .chart-box {
+        background-color: #f8f9fa;
+        border-radius: 10px;
+        padding: 20px;
+        margin: 10px;
+        box-shadow: 0 2px 5px rgba(0, 0, 0, 0.1);
+    }
+    .commitment-card {
+        background-color: #ee6c4d;
+        border-radius: 10px;
+        box-shadow: 0 2px 10px rgba(0, 0, 0, 0.1);
+        margin-bottom: 20px;
+        overflow: hidden;
+    }
+    .commitment-header {
+        display: flex;
+        background-color: #3d5a80;
+        color: white;
+        padding: 15px;
+    }
+    .commitment-header-left {
+        flex: 1;
+        background-color: #98c1d9;
+        margin-right: 5px;
+        padding: 10px;
+    }
+    .commitment-header-right {
+        flex: 2;
+        padding: 10px;
+    }
+    .commitment-subheader {
+        display: flex;
+        background-color: #3d5a80;
+        color: #e8eaeb;
+        padding: 0px;
+        margin-left: 15px
+        margin-right: 15px
+    }
+    .commitment-subheader-left {
+        flex: 2;
+        margin-right: 5px;
+        margin-left: 10px;
+        padding: 5px;
+    }
+    .commitment-subheader-middle {
+        flex: 3;
+        padding: 5px;
+        margin-left: 30px
+    }
+    .commitment-subheader-right {
+        flex: 1;
+        padding: 5px;
+        margin-right: 5px
+        margin-left: 10px
+    }
+    .commitment-title {
+        font-size: 1.2em;
+        font-weight: bold;
+        margin-bottom: 5px;
+    }
+    .commitment-date {
+        font-size: 0.9em;
+        letter-spacing: 3px;
+        text-transform: uppercase;
+    }
+    .commitment-maker-type {
+        font-size: 0.9em;
+        letter-spacing: 3px;
+        text-transform: uppercase;
+    }
+    .under-titles {
+        font-size: 0.9em;
+        letter-spacing: 3px;
+        text-transform: uppercase;
+    }
+    .geog-titles {
+        font-size: 0.75em;
+        letter-spacing: 2px;
+        text-transform: uppercase;
+        flex-wrap: wrap;
+        text-align: center;
+        margin-bottom: 0px;
+    }
+    .commitment-info {
+        display: flex;
+        flex-wrap: wrap;
+        padding: 15px;
+        background-color: #f8f9fa;
+    }
+    .info-item {
+        flex: 1 0 50%;
+        margin-bottom: 10px;
+    }
+    .info-subitem {
+        text-align: center;
+        display: flex;
+        align-items: center;
+        gap: 10px;
+        flex-wrap: wrap;
+    }
+    .type-icon-item {
+        gap: 10px;
+    }
+    .info-icon {
+        margin-right: 10px;
+        margin-left: 10px;
+        color: #ee6c4d;
+    }
+     .theme-icon {
+        margin-right: 10px;
+        color: #ee6c4d;
+    }
+    .details-header {
+        background-color: #ee6c4d;
+        color: white;
+        padding: 10px 15px;
+        cursor: pointer;
+    }
+    .details-content {
+        padding: 15px;
+        background-color: #f8f9fa;
+    }
+    .submit-update {
+        background-color: #ee6c4d;
+        color: white;
+        padding: 10px 15px;
+        text-align: center;
+        cursor: pointer;
+        font-weight: bold;
+    }
+    .streamlit-expanderHeader {
+        background-color: #ee6c4d !important;
+        color: white !important;
+        border: none !important;
+        border-radius: 5px !important;
+        padding: 10px !important;
+        margin-bottom: 15px !important;
+        font-size: 18px !important;
+    }
+    .line {
+        width: 75%;
+        height: 2px;
+        background-color: white;
+        font-weight: bold;
+    }
+    .big-number {
+        font-size: clamp(2.5rem, 8vw, 6rem);
+        text-align: center;
+        text-align: center;
+        width: 100%;
+        overflow-x: auto;
+        white-space: nowrap;
+    }
+    .chart-container {
+        padding: 20px !important;
+        margin: 20px !important;
+    }
+    .pie-chart-container {
+        padding: 50px !important;
+        margin-left: 100px !important;
+        margin-right: 100px !important;
+    }
+    .submit-button {
+        background-color: #ee6c4d;
+        color: white;
+        padding: 10px 15px;
+        text-align: center;
+        text-decoration: none;
+        display: inline-block;
+        border-radius: 5px;
+        margin-top: 10px;
+    }
+    .pie-chart-title {
+        text-align: center;
+        margin-bottom: 10px;
+    }
+"""
+
+
+def get_icons(items, icon_dict, var, icons):
+    icons_html = []
+    if isinstance(items,str):
+        if ';' in items:
+            split_items = items.split(';')
+        elif ',' in items: 
+            split_items = items.split(',')
+        else:
+            split_items = [items]
+
+        for item in split_items:
+            item = item.strip()
+            if item in icon_dict:
+                img_src = icons.uri(icon_dict[item])
+                if var == 'type':
+                    icons_html.append(f'<img src="{img_src}" style="width: 30px; height: 30px; margin-right: 5px;">')
+                else:
+                    icons_html.append(f'<img src="{img_src}" style="width: 125px; height: 125px; margin-right: 5px;">')
+            else:
+                icons.warn_once(f"Var = {var}; Item not found in dictionary: {item}")
+        
+        return '     '.join(icons_html)
+    else:
+        return ""
+
+
+def get_pie_icons(item, icon_dict, icons):
+    if isinstance(item,str):
+        if item in icon_dict:
+            img_src = icons.uri(icon_dict[item])
+            if img_src:
+                return f'<img src="{img_src}" style="width: 25px; height: 25px; margin-right: 5px; vertical-align: middle;">'
+        else:
+            icons.warn_once(f"Error: {item} not found in icon dictionary")
+    else:
+        return ""
+
+
+def format_number(value):
+    if value >= 1_000_000_000:
+        return f"${value / 1_000_000_000:.2f} B"
+    elif value >= 1_000_000:
+        return f"${value / 1_000_000:.2f} M"
+    elif value >= 1:
+        return f"${value:,}"        
+    else:
+        return ""
+
+
+def add_money_icon(value):
+    if value >= 1:
+        return '💰'
+    else:
+        return ''
+
+
+class Markup(str):
+    """Text that is already HTML and goes into a card template unescaped."""
+
+
+def escape(value):
+    """HTML-safe text for a field: Markup as is, missing values as nothing, the rest escaped."""
+    if isinstance(value, Markup):
+        return value
+    if value is None or (not isinstance(value, str) and pd.isna(value)):
+        return ''
+    return html.escape(str(value))
+
+
+def safe_url(value):
+    """value if it is an http(s) or mailto link, else '#' (no javascript: or data: links)."""
+    value = '' if value is None or (not isinstance(value, str) and pd.isna(value)) else str(value).strip()
+    return value if re.match(r'(?:https?:|mailto:)', value, re.IGNORECASE) else '#'
+
+
+class CardTemplate:
+    """Card markup with $name fields, split into literal text and field names once at import.
+
+    Rendering only joins the pieces; every field value is escaped on the
+    way in unless it is Markup.
+    """
+
+    def __init__(self, source):
+        parts = re.split(r'\$(\w+)', source)
+        self.literals, self.fields = parts[0::2], parts[1::2]
+
+    def render(self, **values):
+        out = [self.literals[0]]
+        for name, literal in zip(self.fields, self.literals[1:]):
+            out.append(escape(values[name]))
+            out.append(literal)
+        return Markup(''.join(out))
+
+
+HEADER = CardTemplate("""
+        <div class="commitment-header">
+            <div class="commitment-header-left">
+                <div class="commitment-maker-type"> $entityType</div>
+                <div class="line"></div>
+                <br>
+                <div class="commitment-title">$entity</div>
+            </div>
+            <div class="commitment-header-right">
+                <div class="commitment-date"> COMMITMENT DATE: $date</div>
+                <div class="line"></div>
+                <br>
+                <div class="commitment-title">$commName</div>
+            </div>  
+        </div>
+        <div class="commitment-subheader">
+            <div class="commitment-subheader-left">
+                <div class="info-item">
+                    <div class="info-subitem">
+                        <span class="info-icon">$type_icons</span>
+                        <div class="geog-titles" style="display: flex; align-items: center;"> $type</div>
+                    </div>
+                </div>
+            </div>
+            <div class="commitment-subheader-middle">
+                <div class="info-item">
+                    <div class="info-subitem">
+                        <img src="$africa_icon" style="width: 30px; height: 30px; margin-right: 10px;">
+                        <div class="geog-titles" style="display: flex; align-items: center;"> $geography </div>
+                    </div>
+                </div>
+            </div>  
+            <div class="commitment-subheader-right">
+                <div class="info-item">
+                    <div class="info-subitem">
+                        <span class="info-icon">$money_icon</span>
+                        <div class="geog-titles"> $amount</div>
+                    </div>
+                </div>
+            </div>
+        </div>
+        """)
+
+DETAILS = CardTemplate("""
+        <div class="commitment-card">
+            <div class="commitment-info">
+                <div class="info-item">
+                    <div class="info-subitem">
+                        <div class="under-titles"> THEME(S): </div> 
+                    </div>
+                </div>
+                <div class="info-item">
+                    <div class="info-subitem">
+                        <div class="under-titles"> SUBTHEME(S): </div> 
+                    </div>
+                </div>
+                <div class="info-item"></div>
+                <div class="info-item"></div>
+                <div class="info-item">
+                    <div class="info-subitem">
+                        <span class="info-icon">$theme_icons</span>
+                    </div>
+                </div>
+                <div class="info-item">
+                    <div class="info-subitem">
+                        <span class="info-icon">$subtheme_icons</span> 
+                    </div>
+                </div>
+            </div>
+            <div class="details-header">DESCRIPTION</div>
+            <div class="details-content">
+                <p>$details</p>
+                <p><strong>OTHER PARTNERS INVOLVED:</strong> $partners</p>
+                <p><strong>UPDATES:</strong> $upd</p>
+                <p><strong>SOURCE:</strong> <a href="$link" target="_blank">$src</a></p>
+                <p><strong>COMMITMENT ID:</strong> $commitmentId</p>
+            </div>
+        </div>
+        """)
+
+# a card with its collapsible details and update link, as the static export shows it
+CARD = CardTemplate("""$header
+        <details><summary class="details-header">DETAILS</summary>$details
+            <a class="submit-button" href="$form_url" target="_blank">SUBMIT AN UPDATE</a>
+        </details>""")
+
+
+def card_header(row, icons):
+    return HEADER.render(
+        entityType=row['entityType'],
+        entity=row['entity'],
+        date=row['date'],
+        commName=row['commName'],
+        type_icons=Markup(get_icons(row['type'], type_icons, 'type', icons)),
+        type=row['type'],
+        africa_icon=icons.uri(africa_icon),
+        geography=row['geography'],
+        money_icon=add_money_icon(row['amntUSD']),
+        amount=format_number(row['amntUSD']),
+    )
+
+
+def _card_details(row, icons):
+    upd = row.get('upd')
+    return DETAILS.render(
+        theme_icons=Markup(get_icons(row['themes'], theme_icons, 'themes', icons)),
+        subtheme_icons=Markup(get_icons(row.get('subthemes'), subtheme_icons, 'subthemes', icons)),
+        details=row.get('details'),
+        partners=row.get('partners', 'N/A'),
+        upd='None' if pd.isna(upd) else upd,
+        link=safe_url(row['link']),
+        src=row['src'],
+        commitmentId=row[ID_COLUMN],
+    )
+
+
+def _card(row, icons):
+    return CARD.render(header=card_header(row, icons), details=_card_details(row, icons), form_url=FORM_URL)
+
+
+def card_details(row, icons, version=None, cache=rdcache.card_cache):
+    """Details markup for one commitment row, cached per commitment when the data version is given."""
+    if version is None or cache is None:
+        return _card_details(row, icons)
+    return cache.get_or_compute((version, row[ID_COLUMN], 'details', icons.static),
+                                lambda: _card_details(row, icons))
+
+
+def render_cards(rows, icons, details=False, version=None, cache=rdcache.card_cache):
+    """index -> card markup for a block of commitment rows.
+
+    Just the headers by default (the app builds details only when a reader
+    opens them); with details=True every card also carries its collapsible
+    details and update link, as the static export shows them. With the
+    dataset version given, each row's markup is rendered once per
+    commitment and version and then served from cache, so a rerun only
+    looks up the fragments for the rows it shows.
+    """
+    build, part = (_card, 'card') if details else (card_header, 'header')
+    if version is None or cache is None:
+        return pd.Series({index: build(row, icons) for index, row in zip(rows.index, rows.to_dict('records'))},
+                         dtype=object)
+    return pd.Series({index: cache.get_or_compute((version, commitment, part, icons.static),
+                                                  lambda: build(rows.loc[index], icons))
+                      for index, commitment in rows[ID_COLUMN].items()}, dtype=object)
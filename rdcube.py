@@ -0,0 +1,111 @@
+"""Pre-aggregated counts and USD sums over the sidebar's filter dimensions.
+
+Commitments can hold several types, themes, subthemes, entities and
+countries at once, so a cell per combination would count them more than
+once. Instead commitments with exactly the same memberships across the
+filter dimensions are grouped into one class: any sidebar filter keeps or
+drops a class whole. Each class stores its commitment count and USD sum,
+and per-country counts and USD, so the dashboard's aggregates for a
+selection are sums over the (few) classes it keeps rather than scans over
+every commitment.
+"""
+import numpy as np
+import pandas as pd
+
+import rdmembers
+
+
+class Cube:
+    def __init__(self, members, countries, amounts):
+        """members: column -> rdmembers.Membership of commitments; countries: commitments x country bool frame."""
+        self.columns = list(members)
+        n = len(countries)
+        # a commitment's class is the exact set of (column, key) it holds: its
+        # sorted global key codes, as bytes, are the class's signature
+        rows, codes, width = [], [], 0
+        for c in self.columns:
+            rows.append(members[c].rows)
+            codes.append(members[c].codes() + width)
+            width += len(members[c].keys)
+        rows, codes = np.concatenate(rows), np.concatenate(codes).astype(np.int32)
+        order = np.lexsort((codes, rows))
+        codes = codes[order]
+        bounds = np.searchsorted(rows[order], np.arange(n + 1))
+        signatures = [codes[start:end].tobytes() for start, end in zip(bounds[:-1], bounds[1:])]
+        # class of each commitment
+        self.row_class = pd.factorize(pd.Series(signatures, dtype=object))[0].astype(np.int32)
+        n_classes = int(self.row_class.max()) + 1 if n else 0
+        self.count = np.bincount(self.row_class, minlength=n_classes)
+        # column -> class membership in each key (every commitment of a class holds the same keys)
+        self.members = {c: members[c].regroup(self.row_class, n_classes) for c in self.columns}
+        self.countries = list(countries.columns)
+
+        amounts = np.asarray(amounts, dtype=float)
+        self.usd = np.bincount(self.row_class, weights=amounts, minlength=n_classes)
+        order = np.argsort(self.row_class, kind='stable')
+        starts = np.searchsorted(self.row_class[order], np.arange(n_classes))
+        covered = countries.to_numpy(dtype=bool)[order]
+        # classes x countries: commitments covering each country, and their USD
+        self.country_count = (np.add.reduceat(covered.astype(np.int32), starts, axis=0) if n
+                              else covered.astype(np.int32))
+        self.country_usd = (np.add.reduceat(covered * amounts[order, None], starts, axis=0)
+                            if n else covered.astype(float))
+
+    # per-class arrays saved by arrays()
+    _arrays = ['row_class', 'count', 'usd', 'country_count', 'country_usd']
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Cube saved by arrays(), without grouping the commitments again."""
+        self = cls.__new__(cls)
+        self.columns = arrays['columns'].tolist()
+        self.countries = arrays['countries'].tolist()
+        for name in cls._arrays:
+            setattr(self, name, arrays[name])
+        self.members = {c: rdmembers.Membership.from_arrays(
+            {k.split('/', 2)[2]: v for k, v in arrays.items() if k.startswith(f'members/{c}/')})
+            for c in self.columns}
+        return self
+
+    def arrays(self):
+        """name -> array of everything from_arrays needs; class memberships under members/<column>/."""
+        arrays = {'columns': np.asarray(self.columns, dtype=str), 'countries': np.asarray(self.countries, dtype=str)}
+        arrays.update((name, getattr(self, name)) for name in self._arrays)
+        for c, membership in self.members.items():
+            arrays.update((f'members/{c}/{k}', v) for k, v in membership.arrays().items())
+        return arrays
+
+    def __len__(self):
+        return len(self.count)
+
+    def has(self, column, key):
+        """Boolean mask of classes holding key (already normalised) in column."""
+        return self.members[column].mask(key)
+
+    def select(self, keys):
+        """Class mask for (column, key) filters AND-ed together."""
+        mask = np.ones(len(self), dtype=bool)
+        for column, key in keys:
+            mask &= self.has(column, key)
+        return mask
+
+    def row_mask(self, class_mask):
+        return class_mask[self.row_class]
+
+    def total(self, class_mask):
+        return int(self.count[class_mask].sum())
+
+    def funding(self, class_mask):
+        return float(self.usd[class_mask].sum())
+
+    def counts(self, column, keys, class_mask):
+        """Number of (selected) commitments holding each key of column."""
+        positions = map(self.members[column].positions, keys)
+        return [int(self.count[classes[class_mask[classes]]].sum()) for classes in positions]
+
+    def country_counts(self, class_mask):
+        return pd.Series(self.country_count[class_mask].sum(axis=0), index=self.countries)
+
+    def country_funding(self, class_mask):
+        """USD pledged by (selected) commitments covering each country."""
+        return pd.Series(self.country_usd[class_mask].sum(axis=0), index=self.countries)
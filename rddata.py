@@ -0,0 +1,791 @@
+"""Data loading for the R&D commitments tracker.
+
+Streamlit reruns rddash.py from the top on every widget change, but imported
+modules stay resident in the server process, so the parsed tracker is kept
+here and shared by every session until the CSV on disk changes.
+
+The CSV is compiled into a typed columnar artifact (see build_dataset.py):
+boolean flag columns, categoricals, parsed dates and long-form child tables
+for the multi-valued fields, stored as Parquet with a manifest recording
+which CSV version it was built from. The indexes built from them (the
+memberships, the country matrix, the search postings and the cube) are
+stored alongside as plain arrays in index.npz. When the manifest matches
+the CSV the artifact is read instead of parsing and tokenising text or
+grouping commitments again.
+
+New and corrected commitments are published as delta files (see ingest.py)
+in data/deltas/<csv name>/. Each is upserted by commitment ID into the
+loaded Dataset: only the changed rows are cleaned and tokenised again, and
+only the cached views those rows could fall into are dropped.
+"""
+import hashlib
+import json
+import logging
+import os
+import re
+import shutil
+import sys
+import threading
+import time
+from contextlib import nullcontext
+from dataclasses import dataclass, field
+
+import numpy as np
+import pandas as pd
+
+import rdcache
+import rdcube
+import rdfx
+import rdgeo
+import rdmembers
+import rdsearch
+import rdtime
+
+log = logging.getLogger('rddash.data')
+
+CSV_PATH = 'RDcomtrack_v4.csv'
+COMPILED_DIR = 'data/compiled'
+COMPILED_FORMAT = 6
+DELTA_DIR = 'data/deltas'
+DELTA_EXTENSIONS = ('.csv', '.jsonl', '.json')
+
+# sidebar choices that are fixed rather than read from the data
+typelist = ['Financial', 'Political', 'In-kind']
+themelist = ['Manufacturing', 'Regulatory', 'Clinical trials']
+
+# sidebar selection order: search text, then these member columns
+selection_columns = ['type', 'themes', 'subthemes', 'entityType', 'entity']
+
+# Theme labels used in the CSV -> the sidebar's theme names (compared via token_key)
+theme_aliases = {
+    'regulatory/quality': 'regulatory',
+    'clinical trial strengthening': 'clinical trials',
+}
+
+# column -> delimiters for the multi-valued fields indexed at load time
+member_columns = {
+    'type': '[;,]',
+    'themes': ';',
+    'subthemes': ';',
+    'entityType': None,
+    'entity': None,
+    'partners': '[;,]',
+}
+
+# CSV 'x' flag column -> the (member column, token) it marks
+flag_tokens = {
+    'typeFin': ('type', 'financial'),
+    'typeIK': ('type', 'in-kind'),
+    'typePol': ('type', 'political'),
+    'thManu': ('themes', 'manufacturing'),
+    'thRQ': ('themes', 'regulatory'),
+    'thCT': ('themes', 'clinical trials'),
+}
+flag_columns = list(flag_tokens)
+# low-cardinality text columns, stored once per distinct value
+categorical_columns = ['entity', 'entityType', 'partners', 'type', 'themes', 'st1', 'st2', 'st3', 'subthemes',
+                       'geography', 'geoOld', 'src']
+DATE_FORMAT = '%d-%b-%y'
+
+# stable key of a commitment; derived from entity, name and date when not given
+ID_COLUMN = 'commitmentId'
+# fields a delta row must fill to add a new commitment
+required_columns = ['entity', 'entityType', 'commName', 'type', 'date']
+# columns computed by clean_frame rather than read from the data
+derived_columns = ['commitDate', 'updDate', 'amntUSDcalc', 'fxMismatch']
+# tracker columns the dashboard reads; the CSV's other columns are not loaded
+loaded_columns = ['entity', 'entityType', 'partners', 'commName', 'type', 'typeFin', 'typeIK', 'typePol', 'thManu',
+                  'thRQ', 'thCT', 'themes', 'st1', 'st2', 'st3', 'subthemes', 'amnt', 'amntUSD', 'geography', 'geoOld',
+                  'details', 'new', 'src', 'link', 'date', 'upd', ID_COLUMN]
+# tracker columns kept for editors but never read here (deltas may still carry them)
+unused_columns = ['multTheme', 'stManu1', 'stManu2', 'stManu3', 'stManu4', 'stManu5', 'stManu6', 'stRQ1', 'stRQ2',
+                  'stRQ3', 'stRQ4', 'stCT1', 'stCT2', 'stCT3', 'stCT4', 'geoNat', 'geoOld2', 'geoReg', 'geoLev', 'prog',
+                  'fu', 'old titles']
+
+
+@dataclass
+class Dataset:
+    df: pd.DataFrame
+    version: str
+    total_money_pledged: float
+    # name -> long-form (row, key) table for each multi-valued field (see build_children)
+    children: dict = field(default_factory=dict)
+    # column -> rdmembers.Membership of commitments in its tokens (see build_members)
+    members: dict = field(default_factory=dict)
+    # boolean commitments x african_countries incidence matrix (see build_countries)
+    countries: pd.DataFrame = None
+    search: rdsearch.SearchIndex = None
+    # sidebar choices read from the data (see build_options)
+    options: dict = field(default_factory=dict)
+    # counts and USD sums by membership class (see rdcube)
+    cube: rdcube.Cube = None
+    # commitments sorted by date, and counts and USD by month and quarter (see rdtime)
+    timeline: rdtime.Timeline = None
+
+    def has(self, column, value):
+        """Boolean mask of rows whose column holds value as a whole token."""
+        return self.members[column].mask(member_key(column, value))
+
+    def counts(self, column, values, mask=None):
+        """Number of (masked) rows holding each of values."""
+        positions = [self.members[column].positions(member_key(column, v)) for v in values]
+        if mask is None:
+            return [len(p) for p in positions]
+        return [int(mask[p].sum()) for p in positions]
+
+    def country_counts(self, mask=None):
+        """Number of (masked) commitments covering each country."""
+        matrix = self.countries if mask is None else self.countries[mask]
+        return matrix.sum().astype(int)
+
+    def country_funding(self, mask=None):
+        """USD pledged by (masked) commitments covering each country."""
+        matrix = self.countries if mask is None else self.countries[mask]
+        amounts = self.df['amntUSD'].to_numpy() if mask is None else self.df['amntUSD'].to_numpy()[mask]
+        return pd.Series(amounts @ matrix.to_numpy(), index=matrix.columns)
+
+    def select(self, selection, rows=None):
+        """(mask, search scores) for a sidebar selection, over all rows or just positions rows.
+
+        selection is (search text, type, theme, subtheme, entity type,
+        entity), with "All" for an unset filter, and optionally a (from,
+        to) date range after them (see date_range); scores is None without
+        a search.
+        """
+        search = selection[0]
+        index = slice(None) if rows is None else rows
+        mask = np.ones(len(self.df) if rows is None else len(rows), dtype=bool)
+
+        # prefix, all-terms search through the index built at load time
+        scores = self.search.scores(search) if search else None
+        if scores is not None:
+            scores = scores[index]
+            mask &= scores > 0
+        for column, value in zip(selection_columns, selection[1:]):
+            if value != "All":
+                mask &= self.has(column, value)[index]
+        start, end = date_range(selection)
+        if start is not None or end is not None:
+            mask &= self.timeline.mask(start, end)[index]
+        return mask, scores
+
+
+def date_range(selection):
+    """(from, to) ISO dates of a selection's date range, None for an open end.
+
+    Selections without a range are the six filter values alone.
+    """
+    start, end = (tuple(selection[1 + len(selection_columns):]) + (None, None))[:2]
+    return start, end
+
+
+_lock = threading.Lock()
+_loaded = {}  # path -> ((mtime_ns, size), applied deltas, base Dataset, Dataset with deltas)
+
+
+def _stat_key(path):
+    st = os.stat(path)
+    return (st.st_mtime_ns, st.st_size)
+
+
+def content_hash(path):
+    h = hashlib.sha256()
+    with open(path, 'rb') as f:
+        for chunk in iter(lambda: f.read(1 << 20), b''):
+            h.update(chunk)
+    return h.hexdigest()[:16]
+
+
+def source_version(path):
+    """Version of the tracker at path: its content hash combined with the FX table's."""
+    key = f"{content_hash(path)}:{rdfx.load_table().version}"
+    return hashlib.sha256(key.encode()).hexdigest()[:16]
+
+
+def _source_stat(path):
+    return (_stat_key(path), rdfx.stat_key())
+
+
+def token_key(value):
+    """Normalise a label for exact matching: case, stray spaces, leading 'the'/'and'.
+
+    >>> token_key('and the  US Development Finance Corporation')
+    'us development finance corporation'
+    """
+    value = re.sub(r'\s+', ' ', str(value)).strip().lower()
+    return re.sub(r'^(?:(?:the|and) )+', '', value)
+
+
+def _filled(values):
+    return values.notna() & (values.astype(str).str.strip() != '')
+
+
+def commitment_ids(df):
+    """Stable IDs from entity, commitment name and date (repeats get a -2, -3... suffix)."""
+    columns = df.reindex(columns=['entity', 'commName', 'date']).astype(object)
+    key = columns['entity'].map(token_key) + '|' + columns['commName'].map(token_key) + '|' + columns['date'].map(token_key)
+    ids = key.map(lambda k: hashlib.sha1(k.encode('utf-8')).hexdigest()[:12])
+    repeat = ids.groupby(ids).cumcount()
+    return ids.where(repeat == 0, ids + '-' + (repeat + 1).astype(str))
+
+
+def member_key(column, value):
+    key = token_key(value)
+    if column == 'themes':
+        key = theme_aliases.get(key, key)
+    return key
+
+
+def split_countries(text):
+    """Tracker country names in a free-text list such as 'Kenya, Vietnam and Zambia'."""
+    found = set()
+    for item in text.split(','):
+        name = rdgeo.country_key(item)
+        if name:
+            found.add(name)
+        else:
+            found.update(filter(None, map(rdgeo.country_key, item.split(' and '))))
+    return found
+
+
+def update_dates(values):
+    """Month of the latest update in each upd text, which starts like 'Sep/24: ...'; NaT if it does not."""
+    month = values.astype(object).str.extract(r'^\s*([A-Za-z]{3}/\d{2})\b', expand=False)
+    return pd.to_datetime(month, format='%b/%y', errors='coerce')
+
+
+def read_tracker(path):
+    """The tracker CSV's loaded columns, unparsed."""
+    return pd.read_csv(path, usecols=lambda column: column in loaded_columns)
+
+
+def clean_frame(df):
+    """Typed tracker frame of the loaded columns: boolean flags, categoricals, parsed dates."""
+    df = df.loc[:, df.columns.isin(loaded_columns)].reset_index(drop=True).copy()
+    df['commitDate'] = pd.to_datetime(df['date'].astype(str).str.strip(), format=DATE_FORMAT, errors='coerce')
+    df['updDate'] = update_dates(df['upd']) if 'upd' in df.columns else pd.NaT
+
+    # amntUSD is filled in by hand; amnt converted at the FX table's rates fills
+    # its gaps, and rows where the two disagree are flagged for review
+    stored = pd.to_numeric(df['amntUSD'], errors='coerce') if 'amntUSD' in df.columns else pd.Series(np.nan, index=df.index)
+    if 'amnt' in df.columns:
+        df['amntUSDcalc'] = rdfx.to_usd(df['amnt'], df['commitDate'])
+    else:
+        df['amntUSDcalc'] = np.nan
+    df['fxMismatch'] = rdfx.mismatches(stored, df['amntUSDcalc'])
+    df['amntUSD'] = stored.fillna(df['amntUSDcalc']).fillna(0)
+    for column in flag_columns:
+        if column in df.columns:
+            values = df[column].astype(str).str.strip().str.lower()
+            df[column] = _filled(df[column]) & ~values.isin(['false', '0', '0.0', 'no'])
+    if 'new' in df.columns:
+        df['new'] = df['new'].astype(str).str.strip().str.lower().isin(['yes', 'true'])
+    ids = commitment_ids(df)
+    if ID_COLUMN in df.columns:
+        ids = df[ID_COLUMN].where(_filled(df[ID_COLUMN]), ids).astype(str).str.strip()
+    df[ID_COLUMN] = ids
+    _categorize(df)
+    return df
+
+
+def _categorize(df):
+    for column in categorical_columns:
+        if column in df.columns and not isinstance(df[column].dtype, pd.CategoricalDtype):
+            df[column] = df[column].astype('category')
+
+
+def _long(values, sep=None):
+    """(row, key) pairs for the normalised tokens of a text column."""
+    values = values.dropna().astype(str)
+    tokens = values.str.split(sep) if sep else values
+    tokens = tokens.explode().dropna().map(token_key)
+    tokens = tokens[tokens != '']
+    return pd.DataFrame({'row': tokens.index.to_numpy(dtype=np.int64), 'key': tokens.to_numpy(dtype=object)})
+
+
+def build_children(df):
+    """Explode each multi-valued field once into a long (row, key) child table.
+
+    Tokens are whole values after case and whitespace normalisation, so one
+    entity's name inside another's is not a match. The CSV's x-flag columns
+    add the type/theme memberships they mark, and geoOld is resolved to the
+    tracker's country names ('Niger' does not match 'Nigeria' rows).
+    """
+    children = {}
+    for column, sep in member_columns.items():
+        child = _long(df[column].astype(object), sep)
+        if column == 'themes':
+            child['key'] = child['key'].replace(theme_aliases)
+        children[column] = child
+    for flag, (column, key) in flag_tokens.items():
+        if flag in df.columns:
+            flagged = pd.DataFrame({'row': df.index[df[flag].to_numpy(dtype=bool)].to_numpy(dtype=np.int64),
+                                    'key': key})
+            children[column] = pd.concat([children[column], flagged])
+    # country lists repeat, so each distinct one is resolved once
+    codes, lists = pd.factorize(df['geoOld'].astype(object).fillna('').astype(str))
+    resolved = pd.Series([sorted(split_countries(v)) for v in lists], dtype=object)
+    countries = pd.Series(resolved.to_numpy()[codes] if len(codes) else [], index=df.index, dtype=object)
+    countries = countries.explode().dropna()
+    children['countries'] = pd.DataFrame({'row': countries.index.to_numpy(dtype=np.int64),
+                                          'key': countries.to_numpy(dtype=object)})
+    return {name: _compact(child.drop_duplicates()) for name, child in children.items()}
+
+
+def _compact(child):
+    """Child table sorted by row and key, with int32 rows and each distinct key stored once."""
+    child = child.astype({'row': np.int32, 'key': object}).sort_values(['row', 'key']).reset_index(drop=True)
+    return child.astype({'key': 'category'})
+
+
+def _matrix(child, n, columns=None):
+    keys = pd.Categorical(child['key'], categories=columns)
+    matrix = np.zeros((n, len(keys.categories)), dtype=bool)
+    valid = keys.codes >= 0
+    matrix[child['row'].to_numpy()[valid], keys.codes[valid]] = True
+    return pd.DataFrame(matrix, columns=list(keys.categories))
+
+
+def build_members(children, n):
+    """Sparse commitments x token membership per filter column, from the child tables.
+
+    Filters then become lookups of the rows holding a token, AND-ed as
+    masks, and per-category counts become list lengths, instead of
+    substring scans on every rerun.
+    An entity's column also marks rows that list it among the partners, as
+    the sidebar's entity filter always did.
+    """
+    members = {column: rdmembers.Membership.from_child(children[column], n)
+               for column in member_columns if column != 'partners'}
+    entity, partners = children['entity'], children['partners']
+    members['entity'] = rdmembers.Membership.from_child(
+        pd.concat([entity, partners[partners['key'].isin(entity['key'])]]).drop_duplicates(), n)
+    return members
+
+
+def build_countries(children, n):
+    """Commitments x african_countries incidence matrix (dense bool; 55 columns stay small)."""
+    return _matrix(children['countries'], n, rdgeo.african_countries)
+
+
+def build_options(df):
+    """Sidebar choices taken from the data, in tracker order."""
+    return {
+        'subthemes': pd.concat([df['st1'], df['st2'], df['st3']]).dropna().unique().tolist(),
+        'entityType': df['entityType'].dropna().unique().tolist(),
+        'entity': df['entity'].dropna().unique().tolist(),
+    }
+
+
+def build_dataset(df, version, children=None, search=None, timeline=None, members=None, countries=None, cube=None):
+    """Dataset of a cleaned frame; the parts passed in (e.g. read from a compiled artifact) are not built again."""
+    if children is None:
+        children = build_children(df)
+    n = len(df)
+    members = build_members(children, n) if members is None else members
+    countries = build_countries(children, n) if countries is None else countries
+    if cube is None:
+        cube = rdcube.Cube({c: members[c] for c in selection_columns}, countries, df['amntUSD'].to_numpy())
+    return Dataset(df=df, version=version, total_money_pledged=df['amntUSD'].sum(),
+                   children=children, members=members, countries=countries,
+                   search=search or rdsearch.SearchIndex(df), options=build_options(df), cube=cube,
+                   timeline=timeline or rdtime.Timeline(df['commitDate'], df['amntUSD']))
+
+
+def _nbytes(value):
+    if isinstance(value, pd.DataFrame):
+        return int(value.memory_usage(deep=True, index=True).sum())
+    if isinstance(value, pd.Series):
+        return int(value.memory_usage(deep=True, index=True))
+    if isinstance(value, np.ndarray):
+        return value.nbytes + (sum(map(sys.getsizeof, value)) if value.dtype == object else 0)
+    if isinstance(value, (list, tuple)):
+        return sys.getsizeof(value) + sum(map(_nbytes, value))
+    if isinstance(value, dict):
+        return sys.getsizeof(value) + sum(_nbytes(k) + _nbytes(v) for k, v in value.items())
+    if hasattr(value, '__dict__'):
+        return _nbytes(vars(value))
+    return sys.getsizeof(value)
+
+
+def memory_usage(dataset):
+    """Bytes held by each part of a loaded Dataset, strings and nested arrays included."""
+    parts = {name: _nbytes(getattr(dataset, name))
+             for name in ['df', 'children', 'members', 'countries', 'cube', 'search', 'timeline', 'options']}
+    parts['total'] = sum(parts.values())
+    return parts
+
+
+def parse_csv(path, version):
+    dataset = build_dataset(clean_frame(read_tracker(path)), version)
+    flagged = int(dataset.df['fxMismatch'].sum())
+    if flagged:
+        log.warning("%d rows' amntUSD disagree with their amnt at the FX table rates", flagged,
+                    extra={'commitments': dataset.df.loc[dataset.df['fxMismatch'], ID_COLUMN].tolist()})
+    return dataset
+
+
+def compiled_path(path):
+    """Default artifact directory for a CSV: data/compiled/<csv name>."""
+    return os.path.join(COMPILED_DIR, os.path.splitext(os.path.basename(path))[0])
+
+
+def _scoped(arrays, prefix):
+    """The arrays named prefix/..., with the prefix dropped."""
+    return {name[len(prefix) + 1:]: value for name, value in arrays.items() if name.startswith(prefix + '/')}
+
+
+def index_arrays(dataset):
+    """name -> array of the memberships, country matrix, search postings and cube, as stored in index.npz."""
+    arrays = {'countries/matrix': dataset.countries.to_numpy(dtype=bool),
+              'countries/columns': np.asarray(list(dataset.countries.columns), dtype=str)}
+    for column, membership in dataset.members.items():
+        arrays.update((f'members/{column}/{name}', value) for name, value in membership.arrays().items())
+    arrays.update((f'search/{name}', value) for name, value in dataset.search.arrays().items())
+    arrays.update((f'cube/{name}', value) for name, value in dataset.cube.arrays().items())
+    return arrays
+
+
+def write_compiled(dataset, out_dir, source=None):
+    """Write the typed frame and child tables as Parquet and the index arrays as npz, swapping the directory in whole."""
+    tmp = out_dir + '.tmp'
+    shutil.rmtree(tmp, ignore_errors=True)
+    os.makedirs(tmp)
+    dataset.df.to_parquet(os.path.join(tmp, 'commitments.parquet'), index=False)
+    for name, child in dataset.children.items():
+        child.to_parquet(os.path.join(tmp, f'{name}.parquet'), index=False)
+    np.savez(os.path.join(tmp, 'index.npz'), **index_arrays(dataset))
+    manifest = {
+        'format': COMPILED_FORMAT,
+        'source': source,
+        'source_version': dataset.version,
+        'fx_version': rdfx.load_table().version,
+        'rows': len(dataset.df),
+        'children': sorted(dataset.children),
+        'members': sorted(dataset.members),
+    }
+    with open(os.path.join(tmp, 'manifest.json'), 'w') as f:
+        json.dump(manifest, f, indent=2)
+    shutil.rmtree(out_dir, ignore_errors=True)
+    os.replace(tmp, out_dir)
+
+
+def read_compiled(out_dir, version):
+    """Dataset from a compiled artifact, or None if it is missing or from another CSV version."""
+    try:
+        with open(os.path.join(out_dir, 'manifest.json')) as f:
+            manifest = json.load(f)
+    except (OSError, ValueError):
+        return None
+    if manifest.get('format') != COMPILED_FORMAT or manifest.get('source_version') != version:
+        return None
+    df = pd.read_parquet(os.path.join(out_dir, 'commitments.parquet'), memory_map=True)
+    _categorize(df)  # Parquet drops the category dtype of all-missing columns
+    children = {name: pd.read_parquet(os.path.join(out_dir, f'{name}.parquet'), memory_map=True)
+                for name in manifest['children']}
+    with np.load(os.path.join(out_dir, 'index.npz'), allow_pickle=False) as f:
+        arrays = {name: f[name] for name in f.files}
+    members = {column: rdmembers.Membership.from_arrays(_scoped(arrays, f'members/{column}'))
+               for column in manifest['members']}
+    countries = pd.DataFrame(arrays['countries/matrix'], columns=arrays['countries/columns'].tolist())
+    search = rdsearch.SearchIndex.from_arrays(_scoped(arrays, 'search'))
+    cube = rdcube.Cube.from_arrays(_scoped(arrays, 'cube'))
+    return build_dataset(df, version, children, search, members=members, countries=countries, cube=cube)
+
+
+def apply_filters(dataset, selection):
+    """Rows of a sidebar selection: {'mask', 'rows', 'classes'}.
+
+    Without a search or date range the selection keeps whole cube classes
+    ('classes' is their mask, rows are in tracker order); a search or date
+    range picks individual rows ('classes' is None; best matches first
+    with a search).
+    """
+    if selection[0] or date_range(selection) != (None, None):
+        mask, scores = dataset.select(selection)
+        rows = np.flatnonzero(mask)
+        if scores is not None:
+            rows = rows[np.argsort(-scores[rows], kind='stable')]
+        return {'mask': mask, 'rows': rows, 'classes': None}
+    cube = dataset.cube
+    classes = cube.select([(column, member_key(column, value))
+                           for column, value in zip(selection_columns, selection[1:]) if value != "All"])
+    mask = cube.row_mask(classes)
+    return {'mask': mask, 'rows': np.flatnonzero(mask), 'classes': classes}
+
+
+def aggregate(dataset, filtered):
+    """Pie counts, country counts and funding, totals and timelines for apply_filters' result.
+
+    Whole classes are summed from the cube; rows picked by a search are
+    aggregated directly. The timelines are counts and USD per month and
+    per quarter; an unfiltered view takes the precomputed ones.
+    """
+    entity_types = dataset.options['entityType']
+    classes = filtered['classes']
+    mask = filtered['mask']
+    timeline_mask = None if mask.all() else mask
+    timeline = {freq: dataset.timeline.rollup(freq, timeline_mask).periods() for freq in rdtime.FREQUENCIES}
+    if classes is None:
+        return {
+            'type_counts': dataset.counts('type', typelist, mask),
+            'theme_counts': dataset.counts('themes', themelist, mask),
+            'entType_counts': dataset.counts('entityType', entity_types, mask),
+            'country_counts': dataset.country_counts(mask).tolist(),
+            'country_funding': dataset.country_funding(mask).tolist(),
+            'filtered_money_pledged': dataset.df['amntUSD'].to_numpy()[mask].sum(),
+            'total_commitments': int(mask.sum()),
+            'timeline': timeline,
+        }
+    cube = dataset.cube
+    return {
+        'type_counts': cube.counts('type', [member_key('type', v) for v in typelist], classes),
+        'theme_counts': cube.counts('themes', [member_key('themes', v) for v in themelist], classes),
+        'entType_counts': cube.counts('entityType', [member_key('entityType', v) for v in entity_types], classes),
+        'country_counts': cube.country_counts(classes).tolist(),
+        'country_funding': cube.country_funding(classes).tolist(),
+        'filtered_money_pledged': cube.funding(classes),
+        'total_commitments': cube.total(classes),
+        'timeline': timeline,
+    }
+
+
+def compute_view(dataset, selection, timer=None):
+    """Row mask and positions for a sidebar selection plus every aggregate drawn from it."""
+    stage = timer.stage if timer is not None else lambda name: nullcontext()
+    with stage('filter'):
+        filtered = apply_filters(dataset, selection)
+    with stage('aggregate'):
+        aggregates = aggregate(dataset, filtered)
+
+    mask, rows = filtered['mask'], filtered['rows']
+    # shared between sessions through the cache, so make sure nobody edits it
+    mask.flags.writeable = False
+    rows.flags.writeable = False
+    return {'mask': mask, 'rows': rows, **aggregates}
+
+
+def cached_view(dataset, selection, timer=None):
+    """compute_view through the process-wide filter cache, keyed by (version,) + selection."""
+    return rdcache.filter_cache.get_or_compute((dataset.version,) + tuple(selection),
+                                               lambda: compute_view(dataset, selection, timer))
+
+
+def delta_path(path):
+    """Directory of published deltas for a CSV: data/deltas/<csv name>."""
+    return os.path.join(DELTA_DIR, os.path.splitext(os.path.basename(path))[0])
+
+
+def read_delta(path):
+    """Rows of a delta file (CSV, JSON lines or a JSON array of records), as unparsed values."""
+    ext = os.path.splitext(path)[1].lower()
+    if ext == '.csv':
+        delta = pd.read_csv(path, dtype=object)
+    elif ext in ('.jsonl', '.json'):
+        delta = pd.read_json(path, lines=ext == '.jsonl', orient='records', dtype=False,
+                             convert_dates=False).astype(object)
+    else:
+        raise ValueError(f"Unsupported delta file type: {path}")
+    return delta.loc[:, ~delta.columns.astype(str).str.startswith('Unnamed:')].reset_index(drop=True)
+
+
+def delta_ids(delta):
+    """Commitment ID of each delta row: the given one, else derived like the tracker's."""
+    derived = commitment_ids(delta)
+    if ID_COLUMN not in delta.columns:
+        return derived
+    return delta[ID_COLUMN].where(_filled(delta[ID_COLUMN]), derived).astype(str).str.strip()
+
+
+def validate_delta(dataset, delta):
+    """Problems that stop delta being ingested into dataset (an empty list if there are none)."""
+    problems = []
+    allowed = (set(dataset.df.columns) | set(unused_columns)) - set(derived_columns)
+    unknown = [str(c) for c in delta.columns if c not in allowed]
+    if unknown:
+        problems.append(f"unknown columns: {', '.join(unknown)}")
+
+    ids = delta_ids(delta)
+    new = ~ids.isin(dataset.df[ID_COLUMN])
+    for i in np.flatnonzero(ids.duplicated(keep=False)):
+        problems.append(f"row {i + 1}: commitment {ids[i]} appears more than once")
+    for column in required_columns:
+        missing = ~_filled(delta[column]) if column in delta.columns else pd.Series(True, index=delta.index)
+        for i in np.flatnonzero(new & missing):
+            problems.append(f"row {i + 1}: new commitment has no {column}")
+
+    if 'type' in delta.columns:
+        types = {token_key(t) for t in typelist}
+        for i, value in delta['type'][_filled(delta['type'])].items():
+            bad = [t.strip() for t in re.split(member_columns['type'], str(value)) if token_key(t) not in types | {''}]
+            if bad:
+                problems.append(f"row {i + 1}: unknown type {', '.join(bad)}")
+    if 'date' in delta.columns:
+        given = _filled(delta['date'])
+        dates = pd.to_datetime(delta['date'].astype(str).str.strip(), format=DATE_FORMAT, errors='coerce')
+        for i in np.flatnonzero(given & dates.isna()):
+            problems.append(f"row {i + 1}: date {delta['date'][i]!r} is not like 26-Jan-24")
+    if 'amntUSD' in delta.columns:
+        given = _filled(delta['amntUSD'])
+        amounts = pd.to_numeric(delta['amntUSD'], errors='coerce')
+        for i in np.flatnonzero(given & amounts.isna()):
+            problems.append(f"row {i + 1}: amntUSD {delta['amntUSD'][i]!r} is not a number")
+    return problems
+
+
+def patch_children(children, df, rows):
+    """Child tables with the entries of positions rows rebuilt from df."""
+    fresh = build_children(df.iloc[rows])
+    return {name: _compact(pd.concat([child[~child['row'].isin(rows)], fresh[name]]))
+            for name, child in children.items()}
+
+
+def apply_delta(dataset, delta, version):
+    """(Dataset with delta's rows upserted by commitment ID, positions of the changed rows).
+
+    A row whose ID is already in the tracker updates that commitment: blank
+    or absent fields keep their value. Other rows are appended. Only the
+    changed rows are cleaned and tokenised again; the child tables, search
+    index and timeline are patched and the membership matrices rebuilt from
+    them.
+    dataset itself is left as it was for the sessions still reading it.
+    """
+    old = dataset.df
+    ids = delta_ids(delta)
+    positions = pd.Series(np.arange(len(old)), index=old[ID_COLUMN].to_numpy())
+    known = ids.isin(positions.index).to_numpy()
+    updated = positions[ids[known]].to_numpy()
+    appended = np.arange(len(old), len(old) + int((~known).sum()))
+
+    edits = delta.assign(**{ID_COLUMN: ids})
+    current = old.iloc[updated].astype(object).reset_index(drop=True)
+    if 'amnt' in edits.columns:
+        # a new amnt without a new amntUSD makes the old USD figure stale
+        new_amnt = _filled(edits.loc[known, 'amnt']).to_numpy()
+        if 'amntUSD' in edits.columns:
+            new_amnt &= ~_filled(edits.loc[known, 'amntUSD']).to_numpy()
+        current.loc[new_amnt, 'amntUSD'] = np.nan
+    merged = edits[known].reset_index(drop=True).combine_first(current)
+    changed = clean_frame(pd.concat([merged, edits[~known]], ignore_index=True).reindex(columns=old.columns))
+    rows = np.concatenate([updated, appended])
+    changed.index = rows
+    # a column the changed rows leave blank takes the tracker's dtype, so it does not sway the concat's
+    blank = [c for c in changed.columns if changed[c].isna().all() and changed[c].dtype != old[c].dtype
+             and old[c].dtype.kind not in 'iub']
+    changed = changed.astype({c: old[c].dtype for c in blank})
+
+    df = pd.concat([old.drop(index=updated), changed]).sort_index()
+    _categorize(df)
+    children = patch_children(dataset.children, df, rows)
+    timeline = dataset.timeline.patched(df['commitDate'], df['amntUSD'], rows)
+    return build_dataset(df, version, children, dataset.search.patched(df, rows), timeline), rows
+
+
+def carry_views(old, new, rows):
+    """Move old's cached views over to new, except those the changed rows could fall into.
+
+    A view is kept when none of the rows at positions rows matched its
+    selection before the delta or matches it after: its rows, counts and
+    totals are then unchanged and only its mask grows by the appended rows.
+    Returns (kept, dropped) entry counts.
+    """
+    updated = rows[rows < len(old.df)]
+    same_options = old.options['entityType'] == new.options['entityType']
+
+    def carry(key, view):
+        selection = key[1:]
+        if key[0] != old.version or not same_options:
+            return None
+        if old.select(selection, updated)[0].any() or new.select(selection, rows)[0].any():
+            return None
+        mask = np.zeros(len(new.df), dtype=bool)
+        mask[:len(view['mask'])] = view['mask']
+        mask.flags.writeable = False
+        return (new.version,) + selection, dict(view, mask=mask)
+
+    return rdcache.filter_cache.rekey(carry)
+
+
+def ingest_delta(dataset, path):
+    """Dataset with the delta file at path applied, carrying over the cached views it leaves alone."""
+    start = time.perf_counter()
+    delta = read_delta(path)
+    problems = validate_delta(dataset, delta)
+    if problems:
+        raise ValueError(f"{path}: " + "; ".join(problems))
+    version = hashlib.sha256((dataset.version + content_hash(path)).encode()).hexdigest()[:16]
+    patched, rows = apply_delta(dataset, delta, version)
+    kept, dropped = carry_views(dataset, patched, rows)
+    log.info("Ingested delta %s", path, extra={
+        'version': version, 'updated': int((rows < len(dataset.df)).sum()),
+        'added': int((rows >= len(dataset.df)).sum()), 'views_kept': kept, 'views_dropped': dropped,
+        'ms': round((time.perf_counter() - start) * 1000, 2),
+    })
+    return patched
+
+
+def _delta_files(delta_dir):
+    """(name, stat key) of each published delta, in publication (file name) order."""
+    try:
+        names = sorted(n for n in os.listdir(delta_dir) if n.lower().endswith(DELTA_EXTENSIONS))
+    except OSError:
+        return ()
+    return tuple((name, _stat_key(os.path.join(delta_dir, name))) for name in names)
+
+
+def _load_base(path, version, compiled_dir):
+    out_dir = compiled_path(path) if compiled_dir is None else compiled_dir
+    dataset = read_compiled(out_dir, version) if out_dir else None
+    if dataset is None:
+        dataset = parse_csv(path, version)
+        if out_dir:
+            try:
+                write_compiled(dataset, out_dir, source=path)
+            except Exception as e:
+                log.warning("Could not write compiled dataset to %s: %s", out_dir, e)
+    return dataset
+
+
+def load_dataset(path=CSV_PATH, compiled_dir=None, delta_dir=None):
+    """Return the parsed tracker, re-reading the CSV only when it changes.
+
+    A cheap stat (mtime + size) of the CSV and the FX table decides whether
+    they have to be hashed again; the content hashes decide whether the
+    tracker has to be loaded again, so a touched-but-identical file keeps
+    the cached frame. A new version is read
+    from the compiled artifact when that matches, otherwise parsed from the
+    CSV and compiled for the next process (compiled_dir=False skips this).
+    Deltas published since the last call are then applied incrementally
+    (delta_dir=False skips them); if one already applied was changed or
+    removed, they are all applied again to the base tracker. The returned
+    frame is shared between sessions and must be treated as read-only.
+    With RDDASH_SHARED=1 the process loads nothing itself and attaches to
+    the version a loader process published instead (see rdshared).
+    """
+    if os.environ.get('RDDASH_SHARED') == '1':
+        import rdshared
+
+        return rdshared.attach(path)
+    key = _source_stat(path)
+    delta_dir = delta_path(path) if delta_dir is None else delta_dir
+    deltas = _delta_files(delta_dir) if delta_dir else ()
+    with _lock:
+        cached = _loaded.get(path)
+        if cached is not None and cached[0] == key and cached[1] == deltas:
+            return cached[3]
+        applied, base, dataset = cached[1:] if cached is not None else ((), None, None)
+        if cached is None or cached[0] != key:
+            version = source_version(path)
+            if base is None or base.version != version:
+                applied, base, dataset = (), _load_base(path, version, compiled_dir), None
+        if deltas[:len(applied)] != applied:
+            applied, dataset = (), None
+        if dataset is None:
+            dataset = base
+        for name, _ in deltas[len(applied):]:
+            try:
+                dataset = ingest_delta(dataset, os.path.join(delta_dir, name))
+            except Exception as e:
+                log.error("Could not apply delta %s: %s", name, e)
+        _loaded[path] = (key, deltas, base, dataset)
+        return dataset
@@ -0,0 +1,181 @@
+"""Plotly figures for the dashboard's charts, built from a view's aggregates.
+
+Shared by the Streamlit app, the static snapshot export and the benchmark.
+plotly.express is imported by the builders that use it rather than up
+front, so importing this module (and starting the app) stays cheap.
+"""
+import pandas as pd
+import plotly.graph_objects as go
+from plotly.colors import sequential
+
+import rdcache
+import rdgeo
+from rddata import themelist, typelist
+
+# what the map colours each country by -> aggregate it plots
+MAP_METRICS = {'Number of commitments': 'count', 'Funding committed': 'usd'}
+# how the timeline buckets commitments -> rdtime period
+TIMELINE_PERIODS = {'By month': 'month', 'By quarter': 'quarter'}
+
+
+def build_map(geojson, country_values, metric='count'):
+    """Choropleth of country_values (in african_countries order) over the bundled boundaries.
+
+    geojson is the boundaries themselves or the URL they are served from.
+    """
+    map_countries, map_names = rdgeo.map_countries()
+    counts = dict(zip(rdgeo.african_countries, country_values))
+    colorMin = 0
+    if metric == 'count' and min(country_values) > 3:
+        colorMin = min(country_values) - 2
+    colorMax = max(max(country_values), 1)
+
+    fig_map = go.Figure(go.Choropleth(
+        geojson=geojson,
+        featureidkey='properties.country',
+        locations=map_countries,
+        z=[counts[c] for c in map_countries],
+        hovertext=map_names,
+        colorscale=sequential.Blues,
+        zmin=colorMin,
+        zmax=colorMax,
+        showscale=False,
+    ))
+    fig_map.update_layout(
+        coloraxis_showscale=False, 
+        showlegend=False, 
+        margin={"r":0,"t":0,"l":0,"b":0},
+        height=600,  # Increase the height to fill the container
+    )
+    fig_map.update_geos(
+        fitbounds="locations", 
+        visible=False, 
+        projection_type="mercator", 
+    )
+    if metric == 'usd':
+        fig_map.update_traces(
+            hovertemplate="Country: %{hovertext}<br><br>Funding committed by commitments<br>that impact this country:<br> $%{z:,.0f}<extra></extra>"
+        )
+    else:
+        fig_map.update_traces(
+            hovertemplate="Country: %{hovertext}<br><br>Number of commitments<br>that impact this country:<br> %{z}<extra></extra>"
+        )
+    return fig_map
+
+
+def build_type_pie(type_counts):
+    import plotly.express as px
+
+    type_counts_df = pd.DataFrame({'Type': typelist, 'Number of commitments': type_counts})
+    fig_type = px.pie(type_counts_df, names='Type', values='Number of commitments', color='Type', 
+                    color_discrete_map={'Financial': '#1EAF5F', 'Political': '#ED7D31', 'In-kind': '#464F60'},
+                    hole=0.25)  # Add hole parameter for donut chart
+    fig_type.update_traces(textposition='inside', textinfo='label+percent',
+                              hovertemplate="Number of commitments that have<br>%{label} elements:<br>%{value} (%{percent})")
+    #fig_type.for_each_trace(lambda t: t.update(text=[f"{get_pie_icons(label,icons_pies)}{label}" for label in t.labels]))
+    fig_type.update_layout(showlegend=False)
+    return fig_type
+
+
+def build_theme_pie(theme_counts):
+    import plotly.express as px
+
+    theme_counts_df = pd.DataFrame({'Theme': themelist, 'Number of commitments': theme_counts})
+    fig_theme = px.pie(theme_counts_df, names='Theme', values='Number of commitments', color='Theme',
+                    color_discrete_map={'Manufacturing': '#37379C', 'Regulatory': '#A8001E', 'Clinical trials': '008C9B'},
+                    hole=0.25)  # Add hole parameter for donut chart
+    fig_theme.update_traces(textposition='inside', textinfo='label+percent',
+                                hovertemplate="Number of commitments related to<br>%{label}:<br>%{value} (%{percent})")
+    #fig_theme.for_each_trace(lambda t: t.update(text=[f"{get_pie_icons(label,icons_pies)}{label}" for label in t.labels]))
+    fig_theme.update_layout(showlegend=False)
+    return fig_theme
+
+
+def build_entType_pie(entTypelist, entType_counts):
+    import plotly.express as px
+
+    entType_counts_df = pd.DataFrame({'Type of entity making commitment': entTypelist, 'Number of commitments': entType_counts})
+    fig_entType = px.pie(entType_counts_df, names='Type of entity making commitment', values='Number of commitments', color='Type of entity making commitment',
+                         hole=0.25)  # Add hole parameter for donut chart
+    fig_entType.update_traces(textposition='inside', textinfo='label+percent',
+                                hovertemplate="Number of %{label} entities<br>making commitments:<br>%{value} (%{percent})")
+    fig_entType.update_layout(showlegend=False)
+    return fig_entType
+
+
+def build_money_bar(total_money_pledged, filtered_money_pledged):
+    import plotly.express as px
+
+    fig_money = px.bar(
+        x=[total_money_pledged, filtered_money_pledged],
+        y=['Total pledged', 'Amount pledged (with filters)'],
+        orientation='h',
+        color=['Total pledged', 'Amount pledged (with filters)'],
+        color_discrete_map={'Total pledged': '#056E23', 'Amount pledged (with filters)': '#1EAF5F'}
+    )
+    fig_money.update_traces(
+        texttemplate="%{y}:<br>$%{x:,.0f}",
+        textposition='inside',
+        hovertemplate=("%{y}:<br>$%{x:,.0f}")
+        )
+    fig_money.update_layout(
+        bargap=0.2,
+        margin=dict(l=20, r=20, t=20, b=20),
+        height=200,
+        showlegend=False,
+        xaxis_title=None,
+        yaxis_title=None,
+        yaxis=dict(showticklabels=False)
+    )
+    return fig_money
+
+
+def build_timeline(timeline):
+    """Commitments per period as bars, with the USD they pledged as a line on a second axis.
+
+    timeline is one of a view's timelines: {'periods', 'count', 'usd'}.
+    """
+    fig_timeline = go.Figure()
+    fig_timeline.add_trace(go.Bar(x=timeline['periods'], y=timeline['count'], name='Commitments',
+                                  marker_color='#ee6c4d',
+                                  hovertemplate="%{x}:<br>%{y} commitments<extra></extra>"))
+    fig_timeline.add_trace(go.Scatter(x=timeline['periods'], y=timeline['usd'], name='Funding committed',
+                                      yaxis='y2', mode='lines+markers', line=dict(color='#056E23'),
+                                      hovertemplate="%{x}:<br>$%{y:,.0f} committed<extra></extra>"))
+    fig_timeline.update_layout(
+        height=300,
+        margin=dict(l=20, r=20, t=20, b=20),
+        xaxis=dict(type='category'),
+        yaxis=dict(title='Commitments', rangemode='tozero'),
+        yaxis2=dict(title='USD', overlaying='y', side='right', rangemode='tozero', showgrid=False),
+        legend=dict(orientation='h', y=1.1),
+    )
+    return fig_timeline
+
+
+def build_figures(dataset, view, geojson, metric='count', period='month', cache=rdcache.figure_cache):
+    """name -> figure for every chart of a view: map, type, theme, entType, money and timeline.
+
+    Figures are cached by the aggregates they plot, so identical counts
+    reuse the prebuilt figure (figures are only read when sent to the
+    browser, so sharing them is safe); pass cache=None to always build.
+    period picks the timeline's buckets: 'month' or 'quarter' (see rdtime).
+    """
+    map_values = view['country_funding'] if metric == 'usd' else view['country_counts']
+    map_source = geojson if isinstance(geojson, str) else rdgeo.GEOMETRY_PATH
+    entTypelist = dataset.options['entityType']
+    total, filtered = dataset.total_money_pledged, view['filtered_money_pledged']
+    timeline = view['timeline'][period]
+    builders = {
+        'map': (('map', map_source, metric, tuple(map_values)), lambda: build_map(geojson, map_values, metric)),
+        'type': (('type', tuple(view['type_counts'])), lambda: build_type_pie(view['type_counts'])),
+        'theme': (('theme', tuple(view['theme_counts'])), lambda: build_theme_pie(view['theme_counts'])),
+        'entType': (('entType', tuple(entTypelist), tuple(view['entType_counts'])),
+                    lambda: build_entType_pie(entTypelist, view['entType_counts'])),
+        'money': (('money', total, filtered), lambda: build_money_bar(total, filtered)),
+        'timeline': (('timeline', period, tuple(timeline['periods']), tuple(timeline['count']), tuple(timeline['usd'])),
+                     lambda: build_timeline(timeline)),
+    }
+    if cache is None:
+        return {name: build() for name, (key, build) in builders.items()}
+    return {name: cache.get_or_compute(key, build) for name, (key, build) in builders.items()}
@@ -0,0 +1,180 @@
+"""Currency normalisation: the tracker's free-text amnt values in USD.
+
+amnt holds text such as '€10 million', 'EUR 9,200,000' or '$ 6.63 Million'.
+Each distinct text is parsed once per process into an amount and a
+currency, and amounts are converted with the local rate table
+(data/fx_rates.csv) at the rate of their commitment month. An amount in a
+currency the table does not list ('CHF 20 million', 'R 100 million') is
+left unconverted rather than taken for dollars. The table's
+content hash is its version and is part of the dataset version, so editing
+it re-converts every amount, and compiled artifacts and cached views built
+with the old rates are not reused.
+"""
+import hashlib
+import logging
+import os
+import re
+import threading
+
+import numpy as np
+import pandas as pd
+
+log = logging.getLogger('rddash.fx')
+
+FX_PATH = 'data/fx_rates.csv'
+BASE_CURRENCY = 'USD'
+
+# currency symbol/code/word (lower case) -> ISO code; any other code is taken as written, upper-cased
+currency_aliases = {
+    '$': 'USD', 'us$': 'USD', 'usd': 'USD', 'dollar': 'USD', 'dollars': 'USD',
+    '€': 'EUR', 'eur': 'EUR', 'euro': 'EUR', 'euros': 'EUR',
+    '£': 'GBP', 'gbp': 'GBP', 'pound': 'GBP', 'pounds': 'GBP',
+    'r': 'ZAR', 'zar': 'ZAR', 'rand': 'ZAR',
+}
+# other currency symbols; amounts in them are left unconverted unless the table lists them
+OTHER_SYMBOLS = '¥₦₹₵₩₽₺₱₪₫₴'
+
+scale_words = {
+    'thousand': 1e3, 'k': 1e3,
+    'million': 1e6, 'mn': 1e6, 'm': 1e6,
+    'billion': 1e9, 'bn': 1e9, 'b': 1e9,
+}
+
+# stored amntUSD differing from the converted amount by more than this share is flagged
+MISMATCH_TOLERANCE = 0.05
+
+NUMBER_PATTERN = r'(\d+(?:\.\d+)?)'
+SCALE_PATTERN = r'(?i:\s*(thousand|million|billion|mn|bn|k|m|b)\b)'
+# thousands separators, including the stray spaces in '550, 000, 000'
+SEPARATOR_PATTERN = r'(?<=\d)[,\s]+(?=\d{3}(?!\d))'
+
+
+def currency_patterns(codes=()):
+    """(currency next to a number, currency anywhere) patterns, for the aliases and the ISO codes in codes.
+
+    A currency is an alias, or any three capital letters ('CHF 20 million').
+    Aliases of one or two letters ('R 100 million') count only written in
+    capitals and next to a number, and never a magnitude letter, so '50 M'
+    is 50 million and 'A 5 million grant' or 'FY 2024: 3 million' have no
+    currency.
+
+    >>> parse_amounts(['50 M', 'A 5 million grant', 'FY 2024: 3 million', 'R 100 million']).values.tolist()
+    [[50000000.0, 'USD'], [5000000.0, 'USD'], [3000000.0, 'USD'], [100000000.0, 'ZAR']]
+    """
+    symbols = ''.join(a for a in currency_aliases if len(a) == 1 and not a.isalpha()) + OTHER_SYMBOLS
+    letters = {a for a in currency_aliases if a.isalpha()}
+    words = sorted({a for a in letters if len(a) > 2} | {c.lower() for c in codes}, key=len, reverse=True)
+    short = sorted(a.upper() for a in letters - set(words) if a not in scale_words)
+    known = rf"[A-Za-z]{{1,2}}\$|[{re.escape(symbols)}]|(?i:\b(?:{'|'.join(words)})\b)|\b[A-Z]{{3}}\b"
+    near = rf"{known}|\b(?:{'|'.join(short)})\b" if short else known
+    return rf"({near})", rf"({known})"
+
+
+class FxTable:
+    """USD per unit of each currency by month, filled forward and back over the months listed."""
+
+    def __init__(self, rates, version):
+        self.version = version
+        table = rates.pivot_table(index='month', columns='currency', values='usd').sort_index().ffill().bfill()
+        self.months = pd.to_datetime(table.index, format='%Y-%m').to_numpy()
+        self.columns = {currency: i for i, currency in enumerate(table.columns)}
+        self.matrix = table.to_numpy()
+
+    def rates(self, currencies, dates):
+        """USD rate for each (currency, date) pair; NaN for a currency the table does not list.
+
+        A date outside the table (or missing) takes the nearest month listed.
+        """
+        currencies = np.asarray(currencies, dtype=object)
+        result = np.where(currencies == BASE_CURRENCY, 1.0, np.nan)
+        if not len(self.months):
+            return result
+        dates = pd.to_datetime(pd.Series(dates)).to_numpy()
+        month = np.searchsorted(self.months, dates, side='right') - 1
+        month = np.where(pd.isna(dates), len(self.months) - 1, np.clip(month, 0, len(self.months) - 1))
+        for currency, column in self.columns.items():
+            hit = currencies == currency
+            result[hit] = self.matrix[month[hit], column]
+        return result
+
+
+_lock = threading.Lock()
+_tables = {}  # path -> ((mtime_ns, size), FxTable)
+_parsed = {}  # (currency codes, amnt text) -> (amount, currency)
+
+
+def stat_key(path=FX_PATH):
+    try:
+        st = os.stat(path)
+    except OSError:
+        return None
+    return (st.st_mtime_ns, st.st_size)
+
+
+def load_table(path=FX_PATH):
+    """The rate table at path, re-read only when the file changes (USD only if it is missing)."""
+    key = stat_key(path)
+    with _lock:
+        cached = _tables.get(path)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        if key is None:
+            log.warning("FX rate table not found: %s; only USD amounts will be converted", path)
+            table = FxTable(pd.DataFrame(columns=['month', 'currency', 'usd']), 'none')
+        else:
+            with open(path, 'rb') as f:
+                version = hashlib.sha256(f.read()).hexdigest()[:16]
+            table = FxTable(pd.read_csv(path, comment='#', dtype={'month': str, 'currency': str}), version)
+        _tables[path] = (key, table)
+        return table
+
+
+def parse_amounts(values, codes=()):
+    """(amount, currency) columns for amnt texts; NaN amount where there is no number.
+
+    The amount is the number written next to a currency ('2024 pledge of $5
+    million' is 5 million dollars), else the first with a magnitude word,
+    else the first number. codes are the ISO codes to recognise besides
+    currency_aliases (those of the rate table); any other currency found is
+    returned as written, and has no rate. A number with no currency is
+    taken to be in USD, as the tracker's plain figures are.
+    """
+    codes = tuple(sorted(codes))
+    values = pd.Series(values, dtype=object)
+    text = values.where(values.notna(), '').astype(str)
+    new = pd.Series(pd.unique(text[~text.map(lambda t: (codes, t) in _parsed)]), dtype=object)
+    if len(new):
+        near, anywhere = currency_patterns(codes)
+        plain = new.str.replace(SEPARATOR_PATTERN, '', regex=True)
+        # (number, magnitude word, currency) of each way of reading the text, the most telling first
+        readings = [
+            plain.str.extract(near + r'\s*' + NUMBER_PATTERN + SCALE_PATTERN + '?')[[1, 2, 0]],
+            plain.str.extract(NUMBER_PATTERN + SCALE_PATTERN + r'?\s*' + near),
+            plain.str.extract(NUMBER_PATTERN + SCALE_PATTERN),
+            plain.str.extract(NUMBER_PATTERN),
+        ]
+        found = pd.DataFrame(np.nan, index=new.index, columns=range(3), dtype=object)
+        for reading in reversed(readings):
+            reading = reading.set_axis(range(reading.shape[1]), axis=1).reindex(columns=range(3))
+            hit = reading[0].notna()
+            found.loc[hit] = reading.loc[hit]
+        value = pd.to_numeric(found[0], errors='coerce') * found[1].str.lower().map(scale_words).fillna(1)
+        token = found[2].fillna(plain.str.extract(anywhere)[0])
+        currency = token.map(lambda t: t if pd.isna(t) else currency_aliases.get(t.lower(), t.upper()))
+        currency = currency.where(value.isna() | currency.notna(), BASE_CURRENCY)
+        _parsed.update(((codes, t), parsed) for t, parsed in zip(new, zip(value, currency)))
+    parsed = text.map(lambda t: _parsed[codes, t])
+    return pd.DataFrame({'amount': parsed.str[0].astype(float), 'currency': parsed.str[1]}, index=values.index)
+
+
+def to_usd(values, dates, table=None):
+    """amnt texts converted to USD at their dates' rates (NaN where not parseable or no rate)."""
+    table = table or load_table()
+    parsed = parse_amounts(values, table.columns)
+    return parsed['amount'] * table.rates(parsed['currency'].to_numpy(), dates)
+
+
+def mismatches(stored, converted, tolerance=MISMATCH_TOLERANCE):
+    """Rows where both amounts are known and differ by more than tolerance of the larger."""
+    both = stored.notna() & converted.notna()
+    return both & ((stored - converted).abs() > tolerance * np.maximum(stored.abs(), converted.abs()))
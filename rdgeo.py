@@ -0,0 +1,112 @@
+"""Africa boundary geometry for the choropleth.
+
+The geometry is a prebuilt, simplified Africa-only GeoJSON bundled with the
+app (see build_geometry.py), so the dashboard never has to reach the
+network. It is read once per process and reused by every rerun. The
+dashboard only needs it as plain GeoJSON, so geopandas (with its shapely,
+pyproj and pyogrio stack) is imported only by code that asks for the
+GeoDataFrame.
+"""
+import hashlib
+import json
+import os
+import threading
+
+GEOMETRY_PATH = 'data/africa.geojson'
+STATIC_DIR = 'static/geo'
+STATIC_URL = 'app/static/geo'
+
+# Country names as they appear in the tracker's geoOld column
+african_countries = [
+    'Algeria', 'Angola', 'Benin', 'Botswana', 'Burkina Faso', 'Burundi', 'Cabo Verde', 'Cameroon', 'Central African Republic',
+    'Chad', 'Comoros', 'Republic of Congo', 'Democratic Republic of the Congo', 'Djibouti', 'Egypt', 'Equatorial Guinea', 'Eritrea',
+    'Somaliland', 'Ethiopia', 'Gabon', 'Gambia', 'Ghana', 'Guinea', 'Guinea-Bissau', "Ivory Coast", 'Kenya', 'Lesotho', 'Liberia',
+    'Libya', 'Madagascar', 'Malawi', 'Mali', 'Mauritania', 'Mauritius', 'Morocco', 'Mozambique', 'Namibia', 'Niger', 'Nigeria',
+    'Rwanda', 'Sao Tome and Principe', 'Senegal', 'Seychelles', 'Sierra Leone', 'Somalia', 'South Africa', 'South Sudan',
+    'Sudan', 'Tanzania', 'Togo', 'Tunisia', 'Uganda', 'Western Sahara', 'Zambia', 'Zimbabwe'
+]
+
+# Other spellings (boundary datasets, tracker free text) -> tracker spelling
+country_aliases = {
+    'Dem. Rep. Congo': 'Democratic Republic of the Congo',
+    'Congo': 'Republic of Congo',
+    'Republic of the Congo': 'Republic of Congo',
+    "Côte d'Ivoire": 'Ivory Coast',
+    "Cote d'Ivoire": 'Ivory Coast',
+    "Côte D'Ivoire": 'Ivory Coast',
+    'Central African Rep.': 'Central African Republic',
+    'Eq. Guinea': 'Equatorial Guinea',
+    'S. Sudan': 'South Sudan',
+    'W. Sahara': 'Western Sahara',
+    'United Republic of Tanzania': 'Tanzania',
+    'Guinea Bissau': 'Guinea-Bissau',
+    'Cape Verde': 'Cabo Verde',
+    'The Gambia': 'Gambia',
+    'São Tomé and Principe': 'Sao Tome and Principe',
+}
+
+
+def country_key(name):
+    """Map a country name onto the tracker's list, or None."""
+    name = name.strip()
+    name = country_aliases.get(name, name)
+    return name if name in african_countries else None
+
+
+_lock = threading.Lock()
+_africa = {}  # path -> GeoDataFrame
+
+
+def load_africa(path=GEOMETRY_PATH):
+    """Return the bundled Africa GeoDataFrame (geounit, name, country, geometry).
+
+    Callers get the shared frame and must not modify it in place.
+    """
+    with _lock:
+        if path not in _africa:
+            import geopandas as gpd
+
+            _africa[path] = gpd.read_file(path)
+        return _africa[path]
+
+
+_geojson = {}  # path -> GeoJSON dict
+_published = {}  # path -> static URL
+
+
+def africa_geojson(path=GEOMETRY_PATH):
+    """Bundled boundaries as a plain GeoJSON dict, parsed once per process and path."""
+    with _lock:
+        if path not in _geojson:
+            with open(path, encoding='utf-8') as f:
+                _geojson[path] = json.load(f)
+        return _geojson[path]
+
+
+def map_countries(path=GEOMETRY_PATH):
+    """(country keys, display names) of the features that have a tracker country."""
+    features = [f['properties'] for f in africa_geojson(path)['features'] if f['properties'].get('country')]
+    return [p['country'] for p in features], [p['name'] for p in features]
+
+
+def publish_geojson(path=GEOMETRY_PATH):
+    """Copy the boundaries into static/ and return the URL browsers can fetch them from.
+
+    The file name carries a content hash, so browsers may cache it for good
+    and a rebuilt geometry gets a fresh URL.
+    """
+    with _lock:
+        if path not in _published:
+            with open(path, 'rb') as f:
+                content = f.read()
+            name = f"africa-{hashlib.sha256(content).hexdigest()[:12]}.geojson"
+            os.makedirs(STATIC_DIR, exist_ok=True)
+            target = os.path.join(STATIC_DIR, name)
+            if not os.path.exists(target):
+                # renamed into place so a server never hands out a half-written file
+                tmp = f"{target}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(content)
+                os.replace(tmp, target)
+            _published[path] = f"{STATIC_URL}/{name}"
+        return _published[path]
@@ -0,0 +1,144 @@
+"""Icon registry for commitment cards and pie labels.
+
+The source PNGs in images/ are ~1100px wide, but the cards only show them
+at 25-125px. The registry is built once per process: every icon is
+downscaled to twice its largest display size and either encoded as a data
+URI, or, when Streamlit static serving is on, written to static/icons/ under
+a content-hashed name and referenced by URL so the browser caches it across
+reruns.
+"""
+import base64
+import hashlib
+import io
+import logging
+import os
+import threading
+
+from PIL import Image
+
+theme_icons = {
+    'Manufacturing': 'images/MANU.png',
+    'Regulatory': 'images/REG.png',
+    'Regulatory/Quality': 'images/REG.png',
+    'Clinical Trial Strengthening': 'images/CT.png',
+    'Clinical Trials': 'images/CT.png',
+    'Clinical trials': 'images/CT.png'
+}
+
+icons_pies = {
+    'Manufacturing': 'images/MANU-wh-icon.png',
+    'Regulatory': 'images/REG-wh-icon.png',
+    'Regulatory/Quality': 'images/REG-wh-icon.png',
+    'Clinical Trial Strengthening': 'images/CT-wh-icon.png',
+    'Clinical Trials': 'images/CT-wh-icon.png',
+    'Clinical trials': 'images/CT-wh-icon.png',
+    'Financial': 'images/fin-wh-icon.png',
+    'Political': 'images/pol-wh-icon.png',
+    'In-kind': 'images/ik-wh-icon.png'
+}
+
+type_icons = {
+    'Financial': 'images/fin.png',
+    'Political': 'images/pol.png',
+    'In-kind': 'images/ik.png'
+}
+
+subtheme_icons = {
+    'Medicines manufacturing - using imported API': 'images/MANU_medmanimp.png',
+    'End-to-end medicines manufacturing - including manufacturing API': 'images/MANU_e2emedman.png',
+    'Vaccines manufacturing - including mRNA vax': 'images/MANU_vax.png',
+    'Diagnostics and other medical devices manufacturing': 'images/MANU_diagmeddev.png',
+    'Tech transfer': 'images/MANU_techtran.png',
+    'Other manufacturing': 'images/MANU_oth.png',
+    'African Medicines Agency': 'images/REG_ama.png',
+    'National/regional regulatory authorities capacity building': 'images/REG_nra.png',
+    'Quality': 'images/REG_qual.png',
+    'Other regulatory/quality': 'images/REG_oth.png',
+    'Clinical trials capacity building/expansion': 'images/CT_capbuild.png',
+    'Clinical trials technology and innovation': 'images/CT_techinnov.png',
+    'Clinical trials data management': 'images/CT_dataman.png',
+    'Other clinical trials': 'images/CT_oth.png'
+}
+
+africa_icon = 'images/africa-wh-icon.png'
+
+# largest size (px) each icon set is displayed at
+display_sizes = [
+    (type_icons, 30),
+    (theme_icons, 125),
+    (subtheme_icons, 125),
+    (icons_pies, 25),
+    ({'Africa': africa_icon}, 30),
+]
+
+log = logging.getLogger('rddash.icons')
+
+STATIC_DIR = 'static/icons'
+STATIC_URL = 'app/static/icons'
+
+
+class IconRegistry:
+    def __init__(self, static=False, static_dir=STATIC_DIR, static_url=STATIC_URL):
+        self.static = static
+        self.static_dir = static_dir
+        self.static_url = static_url
+        self.uris = {}
+        self.missing = []
+        self._warned = set()
+
+        sizes = {}
+        for icon_dict, px in display_sizes:
+            for path in icon_dict.values():
+                sizes[path] = max(px, sizes.get(path, 0))
+        for path, px in sizes.items():
+            if not os.path.isfile(path):
+                self.missing.append(path)
+                self.uris[path] = ''
+                continue
+            self.uris[path] = self._encode(path, px * 2)
+        if self.missing:
+            log.warning("Image files not found: %s", ", ".join(sorted(self.missing)))
+
+    def _encode(self, path, px):
+        img = Image.open(path)
+        img.thumbnail((px, px))
+        buf = io.BytesIO()
+        img.save(buf, format='PNG', optimize=True)
+        data = buf.getvalue()
+        if self.static:
+            # the hash in the name lets browsers cache an icon for good; a
+            # changed image gets a new URL instead of a stale cached copy
+            stem = os.path.splitext(os.path.basename(path))[0]
+            name = f"{stem}-{hashlib.sha256(data).hexdigest()[:12]}.png"
+            target = os.path.join(self.static_dir, name)
+            if not os.path.exists(target):
+                os.makedirs(self.static_dir, exist_ok=True)
+                # written under a temporary name, then renamed into place, so
+                # a server never hands out a half-written file
+                tmp = f"{target}.{os.getpid()}.tmp"
+                with open(tmp, 'wb') as f:
+                    f.write(data)
+                os.replace(tmp, target)
+            return f"{self.static_url}/{name}"
+        return "data:image/png;base64," + base64.b64encode(data).decode('utf-8')
+
+    def uri(self, path):
+        """Image src for an icon path; empty string if the file is missing."""
+        return self.uris.get(path, '')
+
+    def warn_once(self, message):
+        if message not in self._warned:
+            self._warned.add(message)
+            log.warning(message)
+
+
+_lock = threading.Lock()
+_registry = None
+
+
+def load_registry(static=False):
+    global _registry
+    with _lock:
+        if _registry is None or _registry.static != static:
+            _registry = IconRegistry(static)
+        return _registry
@@ -0,0 +1,135 @@
+"""Logging and per-rerun timing for the dashboard.
+
+Records are written as JSON lines to a size-rotated log file through an
+in-memory buffer, which is flushed every few seconds, when it fills up, or
+straight away for warnings and errors. All dashboard modules log under the
+'rddash' logger. RunTimer measures the pipeline stages of one script run
+and logs them as a single record.
+"""
+import json
+import logging
+import logging.handlers
+import os
+import threading
+import time
+from collections import deque
+from contextlib import contextmanager
+
+LOG_PATH = os.environ.get('RDDASH_LOG_PATH', 'log.txt')
+LOG_LEVEL = os.environ.get('RDDASH_LOG_LEVEL', 'INFO')
+
+# fields every LogRecord has; anything else was passed through extra=
+_RECORD_FIELDS = set(vars(logging.LogRecord('', 0, '', 0, '', (), None))) | {'message', 'asctime'}
+
+
+class JsonFormatter(logging.Formatter):
+    def format(self, record):
+        entry = {
+            'ts': self.formatTime(record, '%Y-%m-%dT%H:%M:%S'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        entry.update({k: v for k, v in vars(record).items() if k not in _RECORD_FIELDS})
+        if record.exc_info:
+            entry['exc'] = self.formatException(record.exc_info)
+        return json.dumps(entry, default=str)
+
+
+class BufferedHandler(logging.handlers.MemoryHandler):
+    """MemoryHandler that also flushes once its oldest record is `interval` seconds old.
+
+    A daemon thread checks the buffer every `interval` seconds, so an idle
+    process still writes out what it holds rather than waiting for the next
+    record.
+    """
+
+    def __init__(self, capacity, target, interval=5.0):
+        super().__init__(capacity, flushLevel=logging.WARNING, target=target, flushOnClose=True)
+        self.interval = interval
+        self._stopped = threading.Event()
+        threading.Thread(target=self._flush_periodically, name='rddash-log-flush', daemon=True).start()
+
+    def shouldFlush(self, record):
+        if super().shouldFlush(record):
+            return True
+        return record.created - self.buffer[0].created >= self.interval
+
+    def _flush_periodically(self):
+        while not self._stopped.wait(self.interval):
+            self.acquire()
+            try:
+                due = bool(self.buffer) and time.time() - self.buffer[0].created >= self.interval
+            finally:
+                self.release()
+            if due:
+                self.flush()
+
+    def close(self):
+        self._stopped.set()
+        super().close()
+
+
+_lock = threading.Lock()
+_configured = False
+
+
+def get_logger(name='rddash'):
+    """Logger under 'rddash', setting up the buffered rotating file on first use."""
+    global _configured
+    with _lock:
+        if not _configured:
+            target = logging.handlers.RotatingFileHandler(LOG_PATH, maxBytes=1 << 20, backupCount=3,
+                                                          encoding='utf-8')
+            target.setFormatter(JsonFormatter())
+            root = logging.getLogger('rddash')
+            root.setLevel(LOG_LEVEL)
+            root.addHandler(BufferedHandler(capacity=200, target=target))
+            root.propagate = False
+            _configured = True
+    return logging.getLogger(name)
+
+
+# the last few runs, for the debug panel
+recent_runs = deque(maxlen=50)
+
+
+class RunTimer:
+    """Wall-clock time per pipeline stage (and payload sizes) for one script run."""
+
+    def __init__(self, started=None):
+        """started: perf_counter() when the run began, if before the timer was created."""
+        self.started = self._last = time.perf_counter() if started is None else started
+        self.stages = {}
+        self.payload = {}
+        self.info = {}
+
+    def lap(self, name):
+        """Charge the time since the previous lap to stage `name`."""
+        now = time.perf_counter()
+        self.stages[name] = self.stages.get(name, 0.0) + (now - self._last) * 1000
+        self._last = now
+
+    @contextmanager
+    def stage(self, name):
+        """Time a block nested inside a lap, e.g. work done only on a cache miss."""
+        start = time.perf_counter()
+        try:
+            yield
+        finally:
+            self.stages[name] = self.stages.get(name, 0.0) + (time.perf_counter() - start) * 1000
+
+    def add_payload(self, name, size):
+        self.payload[name] = self.payload.get(name, 0) + size
+
+    def finish(self, logger=None):
+        self.total_ms = (time.perf_counter() - self.started) * 1000
+        summary = {
+            'total_ms': round(self.total_ms, 2),
+            'stages_ms': {k: round(v, 2) for k, v in self.stages.items()},
+            'payload_bytes': self.payload,
+            **self.info,
+        }
+        recent_runs.append(summary)
+        (logger or get_logger()).info('rerun', extra=summary)
+        return summary
@@ -0,0 +1,87 @@
+"""Sparse membership of rows in the keys of a multi-valued column.
+
+A dense rows x keys boolean matrix grows with rows times distinct keys,
+and the entity column has about one key per twenty commitments, so it
+grows with the square of the tracker. Membership stores, for each key,
+the sorted positions of the rows holding it (one int32 per membership),
+and builds a boolean row mask only for the keys a filter asks about.
+"""
+import numpy as np
+import pandas as pd
+
+
+class Membership:
+    def __init__(self, rows, codes, n, keys):
+        """rows[i] holds keys[codes[i]]; pairs with a negative code are ignored; n is the number of rows."""
+        rows, codes = np.asarray(rows), np.asarray(codes)
+        valid = codes >= 0
+        rows, codes = rows[valid], codes[valid]
+        order = np.lexsort((rows, codes))
+        self.n = n
+        self.keys = list(keys)
+        # rows holding key i are rows[offsets[i]:offsets[i + 1]], ascending
+        self.rows = rows[order].astype(np.int32)
+        self.offsets = np.searchsorted(codes[order], np.arange(len(self.keys) + 1))
+        self._index = {key: i for i, key in enumerate(self.keys)}
+
+    @classmethod
+    def from_child(cls, child, n, keys=None):
+        """From a long (row, key) table; keys fixes the key order (default: sorted keys of child)."""
+        codes = pd.Categorical(child['key'], categories=keys)
+        return cls(child['row'].to_numpy(), codes.codes, n, codes.categories)
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Membership saved by arrays(), without sorting anything again."""
+        self = cls.__new__(cls)
+        self.n = int(arrays['n'])
+        self.keys = arrays['keys'].tolist()
+        self.rows = arrays['rows']
+        self.offsets = arrays['offsets']
+        self._index = {key: i for i, key in enumerate(self.keys)}
+        return self
+
+    def arrays(self):
+        """name -> array of everything from_arrays needs (keys as a fixed-width string array)."""
+        return {'n': np.asarray(self.n), 'keys': np.asarray(self.keys, dtype=str), 'rows': self.rows,
+                'offsets': self.offsets}
+
+    def __len__(self):
+        return self.n
+
+    def __contains__(self, key):
+        return key in self._index
+
+    @property
+    def columns(self):
+        return self.keys
+
+    def positions(self, key):
+        """Sorted positions of the rows holding key (empty if no row does)."""
+        i = self._index.get(key)
+        if i is None:
+            return self.rows[:0]
+        return self.rows[self.offsets[i]:self.offsets[i + 1]]
+
+    def mask(self, key):
+        """Boolean mask of the rows holding key."""
+        mask = np.zeros(self.n, dtype=bool)
+        mask[self.positions(key)] = True
+        return mask
+
+    def codes(self):
+        """Key code of each entry of self.rows."""
+        return np.repeat(np.arange(len(self.keys)), np.diff(self.offsets))
+
+    def regroup(self, groups, n_groups):
+        """Membership of groups in the keys, where row r belongs to group groups[r].
+
+        A group holds a key when any of its rows does.
+        """
+        width = max(len(self.keys), 1)
+        pairs = np.unique(groups[self.rows].astype(np.int64) * width + self.codes())
+        return Membership(pairs // width, pairs % width, n_groups, self.keys)
+
+    @property
+    def nbytes(self):
+        return self.rows.nbytes + self.offsets.nbytes
@@ -0,0 +1,124 @@
+"""The dashboard's render path as plain functions, without Streamlit.
+
+    load_dataset -> apply_filters -> aggregate -> build_figures, render_cards
+
+rddash.py is a thin Streamlit shell over these stages. The same calls
+serve batch jobs (export_snapshot.py), profiling (benchmark.py) and any
+other entry point, with the same process-wide caches behind them. render()
+runs the whole path for one selection and returns everything a page shows.
+
+warm_up() runs that path once for the default view when a process starts
+(see serve.py), so the first visitor finds the data, indexes, icons and
+figures cached rather than waiting on them.
+"""
+import threading
+import time
+
+import pandas as pd
+
+import rddata
+import rdfigures
+import rdgeo
+import rdicons
+import rdlog
+from rdcards import render_cards
+from rddata import aggregate, apply_filters, load_dataset
+from rdfigures import build_figures
+
+PAGE_SIZE_OPTIONS = [10, 25, 50, 100]
+DEFAULT_PAGE_SIZE = 25
+
+# import times recorded by the launcher and warm-up stage times, in ms
+startup = {'imports_ms': {}, 'warm_up_ms': {}}
+# set once this process's caches are warm: by warm_up or a completed dashboard run
+ready = threading.Event()
+
+
+def make_selection(search='', type='All', themes='All', subthemes='All', entityType='All', entity='All', dates=None):
+    """Normalised selection tuple: (search text, type, theme, subtheme, entity type, entity[, from, to]).
+
+    dates is a (from, to) pair of dates, either of which may be None. The
+    range is appended as ISO dates only when set, so selections without one
+    keep their shape (and their cache keys and log entries).
+    """
+    selection = (search.strip().lower(), type, themes, subthemes, entityType, entity)
+    start, end = dates or (None, None)
+    if start is None and end is None:
+        return selection
+    return selection + tuple(None if d is None else pd.Timestamp(d).strftime('%Y-%m-%d') for d in (start, end))
+
+
+def paginate(rows, page, page_size=DEFAULT_PAGE_SIZE):
+    """(row positions on page, first position's offset, number of pages); page counts from 1."""
+    n_pages = max(1, -(-len(rows) // page_size))
+    start = (min(max(page, 1), n_pages) - 1) * page_size
+    return rows[start:start + page_size], start, n_pages
+
+
+def map_geometry(static=False):
+    """Map boundaries as the app ships them: a static URL the browser caches, or inline GeoJSON."""
+    return rdgeo.publish_geojson() if static else rdgeo.africa_geojson()
+
+
+def render(dataset, selection, page=1, page_size=DEFAULT_PAGE_SIZE, metric='count', period='month', geojson=None,
+           icons=None, details=False, timer=None):
+    """Everything one dashboard page shows for a selection.
+
+    Returns the view's aggregates, the figures by name, and the requested
+    page of cards (index -> markup) with its paging info. The view comes
+    through the filter cache, the figures through the figure cache and the
+    cards through the card cache.
+    """
+    if geojson is None:
+        geojson = map_geometry()
+    if icons is None:
+        icons = rdicons.load_registry()
+    view = rddata.cached_view(dataset, selection, timer)
+    figures = build_figures(dataset, view, geojson, metric, period)
+    if timer is not None:
+        timer.lap('figures')
+    rows, start, n_pages = paginate(view['rows'], page, page_size)
+    cards = render_cards(dataset.df.iloc[rows], icons, details, dataset.version)
+    if timer is not None:
+        timer.lap('cards')
+    return {
+        'view': view,
+        'figures': figures,
+        'cards': cards,
+        'page': start // page_size + 1,
+        'pages': n_pages,
+        'start': start,
+    }
+
+
+def warm_up(csv_path=rddata.CSV_PATH, static=False):
+    """Fill the caches a first visitor would otherwise wait on, then set ready.
+
+    Loads the dataset and its indexes, the icon registry and the map
+    geometry, computes the default view, builds and serialises its figures
+    for every map metric and timeline period (which also loads plotly's
+    figure machinery) and renders its first page of cards. static must
+    match the app's server.enableStaticServing so the cached entries are
+    the ones it asks for.
+    """
+    times = startup['warm_up_ms']
+
+    def timed(name, func):
+        start = time.perf_counter()
+        result = func()
+        times[name] = round((time.perf_counter() - start) * 1000, 2)
+        return result
+
+    dataset = timed('dataset', lambda: load_dataset(csv_path))
+    icons = timed('icons', lambda: rdicons.load_registry(static))
+    geojson = timed('geometry', lambda: map_geometry(static))
+    view = timed('view', lambda: rddata.cached_view(dataset, make_selection()))
+    for metric in rdfigures.MAP_METRICS.values():
+        for period in rdfigures.TIMELINE_PERIODS.values():
+            timed(f'figures_{metric}_{period}',
+                  lambda: [fig.to_json() for fig in build_figures(dataset, view, geojson, metric, period).values()])
+    timed('cards', lambda: render_cards(dataset.df.iloc[paginate(view['rows'], 1)[0]], icons,
+                                        version=dataset.version))
+    ready.set()
+    rdlog.get_logger('rddash.startup').info('warm_up', extra=startup)
+    return startup
@@ -0,0 +1,155 @@
+"""Full-text search over the commitment text columns.
+
+The index is built once per dataset version. Postings are stored sorted by
+(token, row), so all the tokens starting with a given prefix occupy one
+contiguous slice: a query term is two binary searches over the vocabulary
+plus a scatter-add of that slice's weights. Queries are tokenised the same
+way as the text, so punctuation and regex metacharacters are never
+interpreted.
+
+After a delta only the changed rows are tokenised: they go into a small
+overlay index that takes precedence over the base index for those rows,
+until they amount to a large share of the tracker and it is rebuilt.
+"""
+import bisect
+import itertools
+
+import numpy as np
+import pandas as pd
+
+# searchable column -> weight of a hit in it when ranking
+search_fields = {
+    'commName': 3.0,
+    'entity': 3.0,
+    'partners': 2.0,
+    'upd': 1.0,
+    'details': 1.0,
+}
+
+TOKEN_PATTERN = r'\w+'
+
+# rebuild the whole index once patched rows exceed this share of all rows
+REBUILD_FRACTION = 0.25
+
+# rows tokenised at a time while building
+CHUNK_ROWS = 4096
+
+
+def normalize(values):
+    """Lower-case and strip accents from a Series of text, so 'developpement' finds 'Développement'."""
+    return (values.astype(object).fillna('').astype(str).str.lower()
+            .str.normalize('NFKD').str.replace(r'[\u0300-\u036f]', '', regex=True))
+
+
+def query_terms(query):
+    return normalize(pd.Series([query])).str.findall(TOKEN_PATTERN)[0]
+
+
+class SearchIndex:
+    def __init__(self, df, fields=None):
+        fields = fields or search_fields
+        self.n_rows = n = len(df)
+        # tokenised CHUNK_ROWS rows at a time into per-chunk codes, so only
+        # one chunk's token strings are alive at once
+        chunks = []  # (rows, local token codes, local vocabulary, weight)
+        for column, weight in fields.items():
+            if column not in df.columns:
+                continue
+            values = df[column].reset_index(drop=True)
+            for start in range(0, n, CHUNK_ROWS):
+                tokens = normalize(values.iloc[start:start + CHUNK_ROWS]).str.findall(TOKEN_PATTERN)
+                rows = np.repeat(np.arange(start, start + len(tokens), dtype=np.int32), tokens.str.len())
+                codes, uniques = pd.factorize(np.fromiter(itertools.chain.from_iterable(tokens), dtype=object,
+                                                          count=len(rows)))
+                chunks.append((rows, codes.astype(np.int32), uniques, weight))
+
+        # vocabulary (sorted) over all chunks; postings sorted by (token, row)
+        vocab = np.unique(np.concatenate([c[2] for c in chunks] or [np.array([], dtype=object)]).astype(object))
+        keys = np.concatenate([np.searchsorted(vocab, uniques)[codes].astype(np.int64) * max(n, 1) + rows
+                               for rows, codes, uniques, _ in chunks] or [np.array([], dtype=np.int64)])
+        weights = np.concatenate([np.full(len(rows), weight, dtype=np.float32)
+                                  for rows, _, _, weight in chunks] or [np.array([], dtype=np.float32)])
+        del chunks
+        keys, inverse = np.unique(keys, return_inverse=True)
+        self.weights = np.bincount(inverse, weights=weights, minlength=len(keys)).astype(np.float32)
+        self.rows = (keys % max(n, 1)).astype(np.int32)
+        # where each token's postings start
+        self.vocab = vocab.tolist()
+        self.offsets = np.searchsorted(keys // max(n, 1), np.arange(len(vocab) + 1))
+
+    @classmethod
+    def from_arrays(cls, arrays):
+        """Index saved by arrays(), without tokenising the text again."""
+        self = cls.__new__(cls)
+        self.n_rows = int(arrays['n_rows'])
+        self.vocab = arrays['vocab'].tolist()
+        self.rows, self.weights, self.offsets = arrays['rows'], arrays['weights'], arrays['offsets']
+        return self
+
+    def arrays(self):
+        """name -> array of everything from_arrays needs (the vocabulary as a fixed-width string array)."""
+        return {'n_rows': np.asarray(self.n_rows), 'vocab': np.asarray(self.vocab, dtype=str), 'rows': self.rows,
+                'weights': self.weights, 'offsets': self.offsets}
+
+    def patched(self, df, rows):
+        """Index of df, which differs from the indexed frame only at positions rows (or beyond its end)."""
+        return PatchedIndex.build(self, df, rows)
+
+    def _postings(self, prefix):
+        lo = bisect.bisect_left(self.vocab, prefix)
+        hi = bisect.bisect_left(self.vocab, prefix + '\U0010ffff', lo)
+        start, end = self.offsets[lo], self.offsets[hi]
+        return self.rows[start:end], self.weights[start:end]
+
+    def scores(self, query):
+        """Per-row relevance for a query, 0 where a row misses any term.
+
+        Every term must match (AND); each term matches any token it is a
+        prefix of. Returns None when the query has no searchable terms.
+        """
+        terms = query_terms(query)
+        if not terms:
+            return None
+        total = np.zeros(self.n_rows)
+        matched = np.ones(self.n_rows, dtype=bool)
+        for term in dict.fromkeys(terms):
+            rows, weights = self._postings(term)
+            term_scores = np.zeros(self.n_rows)
+            np.add.at(term_scores, rows, weights)
+            matched &= term_scores > 0
+            total += term_scores
+        total[~matched] = 0
+        return total
+
+
+class PatchedIndex:
+    """A base SearchIndex plus an overlay index of the rows changed since it was built."""
+
+    def __init__(self, base, df, rows):
+        self.base = base
+        self.n_rows = len(df)
+        self.rows = rows
+        # overlay row i is df row self.rows[i]
+        self.overlay = SearchIndex(df.iloc[rows])
+
+    @classmethod
+    def build(cls, base, df, rows):
+        if isinstance(base, PatchedIndex):
+            rows = np.union1d(base.rows, rows)
+            base = base.base
+        rows = np.unique(rows)
+        if len(rows) > REBUILD_FRACTION * len(df):
+            return SearchIndex(df)
+        return cls(base, df, rows)
+
+    def patched(self, df, rows):
+        return PatchedIndex.build(self, df, rows)
+
+    def scores(self, query):
+        base = self.base.scores(query)
+        if base is None:
+            return None
+        total = np.zeros(self.n_rows)
+        total[:len(base)] = base
+        total[self.rows] = self.overlay.scores(query)
+        return total
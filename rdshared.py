@@ -0,0 +1,189 @@
+"""Share one loaded tracker between several dashboard processes.
+
+Each Streamlit worker behind a balancer would otherwise parse the tracker
+and build its own copy of every index. Instead one loader process
+(python rdshared.py) loads it as usual (compiled artifact, then deltas)
+and publishes the Dataset to data/shared/<csv name>/<version>/:
+
+    dataset.pickle   the Dataset, pickled (protocol 5) without its arrays
+    buffers.bin      every array, each 64-byte aligned
+
+The arrays are pickled out of band: the frame's numeric, boolean and
+categorical-code columns, its text columns (stored as Arrow strings), the
+child tables, memberships, cube, search postings and timeline. A worker
+unpickles against a read-only memory map of buffers.bin, so its arrays
+point into pages the OS shares between all the workers; only the small
+Python objects (keys, vocabulary, categories, options) are copied.
+
+CURRENT names the published version and is swapped in whole (os.replace),
+so a worker reads either the old version or the new one, never part of
+one. Workers run with RDDASH_SHARED=1, which makes rddata.load_dataset
+attach here: it checks CURRENT on each call and attaches to a new version
+when the loader publishes one. With --watch the loader keeps polling the
+CSV and deltas and publishes each new version; it keeps the previous one
+for workers still attached to it and removes older ones.
+
+    python rdshared.py [--csv PATH] [--watch SECONDS]
+"""
+import argparse
+import logging
+import mmap
+import os
+import pickle
+import shutil
+import threading
+import time
+
+import pandas as pd
+
+import rddata
+
+log = logging.getLogger('rddash.shared')
+
+SHARED_DIR = 'data/shared'
+# a worker waits this long (in seconds) for the loader's first version
+ATTACH_TIMEOUT = float(os.environ.get('RDDASH_SHARED_TIMEOUT', 120))
+ALIGNMENT = 64
+
+
+def shared_path(path):
+    """Directory of published versions for a CSV: data/shared/<csv name>."""
+    return os.path.join(SHARED_DIR, os.path.splitext(os.path.basename(path))[0])
+
+
+def _shareable(dataset):
+    """dataset with its frame's text columns as Arrow strings, which pickle out of band."""
+    df = dataset.df.copy(deep=False)
+    for column in df.columns[df.dtypes == object]:
+        df[column] = df[column].astype(pd.StringDtype('pyarrow'))
+    return rddata.Dataset(**{**vars(dataset), 'df': df})
+
+
+def write_shared(dataset, out_dir):
+    """Write dataset as dataset.pickle and buffers.bin in out_dir; returns (pickle, buffer) sizes."""
+    buffers = []
+    data = pickle.dumps(_shareable(dataset), protocol=5, buffer_callback=buffers.append)
+    layout = []
+    with open(os.path.join(out_dir, 'buffers.bin'), 'wb') as f:
+        for buffer in buffers:
+            raw = buffer.raw()
+            f.write(b'\0' * (-f.tell() % ALIGNMENT))
+            layout.append((f.tell(), raw.nbytes))
+            f.write(raw)
+        size = f.tell()
+    with open(os.path.join(out_dir, 'dataset.pickle'), 'wb') as f:
+        pickle.dump((layout, data), f, protocol=5)
+    return len(data), size
+
+
+def read_shared(out_dir):
+    """The Dataset in out_dir, its arrays read-only views of the memory-mapped buffers."""
+    with open(os.path.join(out_dir, 'dataset.pickle'), 'rb') as f:
+        layout, data = pickle.load(f)
+    with open(os.path.join(out_dir, 'buffers.bin'), 'rb') as f:
+        # an empty file cannot be mapped; then there are no buffers to read either
+        view = memoryview(mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) if layout else b'')
+    return pickle.loads(data, buffers=[view[start:start + size] for start, size in layout])
+
+
+def publish(dataset, root, keep=2):
+    """Write dataset under root/<version>/ unless it is there, make it CURRENT and prune old versions.
+
+    Returns (pickle, buffer) sizes, or None if the version was already written.
+    """
+    os.makedirs(root, exist_ok=True)
+    out_dir = os.path.join(root, dataset.version)
+    sizes = None
+    if not os.path.isdir(out_dir):
+        tmp = out_dir + '.tmp'
+        shutil.rmtree(tmp, ignore_errors=True)
+        os.makedirs(tmp)
+        sizes = write_shared(dataset, tmp)
+        os.replace(tmp, out_dir)
+    with open(os.path.join(root, 'CURRENT.tmp'), 'w') as f:
+        f.write(dataset.version)
+    os.replace(os.path.join(root, 'CURRENT.tmp'), os.path.join(root, 'CURRENT'))
+
+    # workers map the files, so removing a version they still hold only frees it once they let go
+    versions = sorted((d for d in os.listdir(root) if os.path.isdir(os.path.join(root, d)) and not d.endswith('.tmp')),
+                      key=lambda d: os.path.getmtime(os.path.join(root, d)), reverse=True)
+    for old in versions[keep:]:
+        if old != dataset.version:
+            shutil.rmtree(os.path.join(root, old), ignore_errors=True)
+    return sizes
+
+
+_lock = threading.Lock()
+_attached = {}  # root -> (CURRENT's stat, Dataset)
+
+
+def _current_stat(current):
+    st = os.stat(current)
+    return (st.st_ino, st.st_mtime_ns, st.st_size)
+
+
+def attach(path=rddata.CSV_PATH, root=None, timeout=ATTACH_TIMEOUT):
+    """The loader's current Dataset for a CSV, attached once per published version.
+
+    Waits up to timeout seconds for the loader to publish a first version.
+    """
+    root = shared_path(path) if root is None else root
+    current = os.path.join(root, 'CURRENT')
+    deadline = time.monotonic() + timeout
+    while True:
+        try:
+            key = _current_stat(current)
+            break
+        except FileNotFoundError:
+            if time.monotonic() > deadline:
+                raise FileNotFoundError(f"No shared dataset published in {root}; start the loader "
+                                        f"(python rdshared.py --csv {path})") from None
+            time.sleep(0.5)
+    with _lock:
+        cached = _attached.get(root)
+        if cached is not None and cached[0] == key:
+            return cached[1]
+        with open(current) as f:
+            version = f.read().strip()
+        if cached is not None and cached[1].version == version:
+            dataset = cached[1]
+        else:
+            start = time.perf_counter()
+            dataset = read_shared(os.path.join(root, version))
+            log.info("Attached to shared dataset %s", version,
+                     extra={'ms': round((time.perf_counter() - start) * 1000, 2)})
+        _attached[root] = (key, dataset)
+        return dataset
+
+
+def serve(path, watch=None):
+    """Load and publish the tracker, then (with watch) republish each new version, polling every watch seconds."""
+    root = shared_path(path)
+    published = None
+    while True:
+        dataset = rddata.load_dataset(path)
+        if dataset.version != published:
+            start = time.perf_counter()
+            sizes = publish(dataset, root)
+            published = dataset.version
+            if sizes is not None:
+                print(f"Published {len(dataset.df)} commitments (version {dataset.version}) to {root} in "
+                      f"{time.perf_counter() - start:.1f} s: {sizes[1] / 2**20:.1f} MB shared, "
+                      f"{sizes[0] / 2**20:.1f} MB copied per worker", flush=True)
+            else:
+                print(f"Version {dataset.version} is current in {root}", flush=True)
+        if not watch:
+            return
+        time.sleep(watch)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--csv', default=rddata.CSV_PATH)
+    parser.add_argument('--watch', type=float, help='poll the CSV and deltas every this many seconds')
+    args = parser.parse_args()
+    os.environ.pop('RDDASH_SHARED', None)  # the loader loads; it does not attach to itself
+    try:
+        serve(args.csv, args.watch)
+    except KeyboardInterrupt:
+        pass
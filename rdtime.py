@@ -0,0 +1,147 @@
+"""Commitment dates: a sorted date index and monthly and quarterly rollups.
+
+The tracker's dates are parsed once, when the frame is cleaned (commitDate,
+and updDate for the latest update; see rddata.clean_frame). Timeline keeps
+the dated commitments sorted by date, so a date-range filter is two binary
+searches, and each commitment's month, so that counts and USD per month or
+quarter for a view are a bincount over its rows. The whole tracker's
+rollups are kept precomputed, and an ingested delta patches them and the
+sorted index with just the rows it changed.
+"""
+import numpy as np
+import pandas as pd
+
+# period -> months it spans
+FREQUENCIES = {'month': 1, 'quarter': 3}
+
+
+def month_codes(dates):
+    """Months since January 1970 of each date; -1 where there is none."""
+    dates = pd.DatetimeIndex(dates)
+    codes = (dates.year - 1970) * 12 + dates.month - 1
+    return np.where(dates.isna(), -1, codes).astype(np.int32)
+
+
+def period_label(code, freq):
+    """'2024-01' for a month, '2024-Q1' for a quarter."""
+    year, month = divmod(code * FREQUENCIES[freq], 12)
+    if freq == 'month':
+        return f"{1970 + year}-{month + 1:02d}"
+    return f"{1970 + year}-Q{month // 3 + 1}"
+
+
+def day(value):
+    """A date as a datetime64 day (value is anything pd.Timestamp takes)."""
+    return np.datetime64(pd.Timestamp(value).normalize(), 'ns')
+
+
+class Rollup:
+    """Commitment counts and USD summed per period, over consecutive periods from code first."""
+
+    def __init__(self, freq, first=0, count=None, usd=None):
+        self.freq = freq
+        self.first = first
+        self.count = np.zeros(0, dtype=np.int64) if count is None else count
+        self.usd = np.zeros(0) if usd is None else usd
+
+    @classmethod
+    def build(cls, months, amounts, freq):
+        return cls(freq).add(months, amounts)
+
+    def add(self, months, amounts, sign=1):
+        """Rollup with the commitments of months (month codes; -1 is undated) added, or taken off with sign=-1."""
+        months = np.asarray(months)
+        dated = months >= 0
+        codes = months[dated] // FREQUENCIES[self.freq]
+        if not len(codes):
+            return self
+        first, last = int(codes.min()), int(codes.max()) + 1
+        if len(self.count):
+            first, last = min(first, self.first), max(last, self.first + len(self.count))
+        count = np.zeros(last - first, dtype=np.int64)
+        usd = np.zeros(last - first)
+        count[self.first - first:self.first - first + len(self.count)] = self.count
+        usd[self.first - first:self.first - first + len(self.usd)] = self.usd
+        count += sign * np.bincount(codes - first, minlength=last - first)
+        usd += sign * np.bincount(codes - first, weights=np.asarray(amounts, dtype=float)[dated],
+                                  minlength=last - first)
+        return Rollup(self.freq, first, count, usd)
+
+    def periods(self):
+        """{'periods', 'count', 'usd'} lists, from the first to the last period with a commitment."""
+        held = np.flatnonzero(self.count)
+        if not len(held):
+            return {'periods': [], 'count': [], 'usd': []}
+        lo, hi = held[0], held[-1] + 1
+        return {
+            'periods': [period_label(self.first + i, self.freq) for i in range(lo, hi)],
+            'count': self.count[lo:hi].tolist(),
+            'usd': self.usd[lo:hi].round(2).tolist(),
+        }
+
+
+class Timeline:
+    def __init__(self, dates, amounts, rollups=None, order=None):
+        """dates and amounts are per commitment; rollups and order are passed on by patched()."""
+        self.dates = np.asarray(pd.DatetimeIndex(dates), dtype='datetime64[ns]')
+        self.amounts = np.asarray(amounts, dtype=float)
+        self.months = month_codes(self.dates)
+        if order is None:
+            dated = np.flatnonzero(~np.isnat(self.dates))
+            order = dated[np.argsort(self.dates[dated], kind='stable')]
+        # positions of the dated commitments, by date, and their dates
+        self.order = np.asarray(order, dtype=np.int32)
+        self.sorted = self.dates[self.order]
+        self.rollups = rollups or {freq: Rollup.build(self.months, self.amounts, freq) for freq in FREQUENCIES}
+
+    def __len__(self):
+        return len(self.dates)
+
+    def bounds(self):
+        """(first, last) commitment date, or None if no commitment is dated."""
+        if not len(self.sorted):
+            return None
+        return pd.Timestamp(self.sorted[0]), pd.Timestamp(self.sorted[-1])
+
+    def positions(self, start=None, end=None):
+        """Positions of the commitments dated start to end, both days included (None leaves a side open)."""
+        lo = 0 if start is None else np.searchsorted(self.sorted, day(start), 'left')
+        hi = len(self.sorted) if end is None else np.searchsorted(self.sorted, day(end) + np.timedelta64(1, 'D'),
+                                                                  'left')
+        return self.order[lo:hi]
+
+    def mask(self, start=None, end=None):
+        mask = np.zeros(len(self.dates), dtype=bool)
+        mask[self.positions(start, end)] = True
+        return mask
+
+    def rollup(self, freq, mask=None):
+        """Counts and USD per period of the (masked) commitments; the whole tracker's are precomputed."""
+        if mask is None:
+            return self.rollups[freq]
+        return Rollup.build(self.months[mask], self.amounts[mask], freq)
+
+    def patched(self, dates, amounts, rows):
+        """Timeline for new per-commitment dates and amounts that differ from these only at positions rows.
+
+        The rollups take off the changed rows' old entries and add their
+        new ones, and the changed rows are merged into the sorted index,
+        rather than rolling up and sorting the whole tracker again.
+        """
+        new = Timeline.__new__(Timeline)
+        new.dates = np.asarray(pd.DatetimeIndex(dates), dtype='datetime64[ns]')
+        new.amounts = np.asarray(amounts, dtype=float)
+        new.months = np.concatenate([self.months, np.full(len(new.dates) - len(self.months), -1, dtype=np.int32)])
+        new.months[rows] = month_codes(new.dates[rows])
+        old = rows[rows < len(self.dates)]
+        new.rollups = {freq: rollup.add(self.months[old], self.amounts[old], -1).add(new.months[rows],
+                                                                                     new.amounts[rows])
+                       for freq, rollup in self.rollups.items()}
+
+        keep = ~np.isin(self.order, rows)
+        order, known = self.order[keep], self.sorted[keep]
+        added = rows[~np.isnat(new.dates[rows])]
+        added = added[np.argsort(new.dates[added], kind='stable')]
+        new.order = np.insert(order, np.searchsorted(known, new.dates[added], 'right'), added).astype(np.int32)
+        new.sorted = new.dates[new.order]
+        return new
@@ -0,0 +1,65 @@
+"""Start the dashboard with its caches already warm.
+
+`streamlit run rddash.py` leaves the imports, the tracker load, the icons
+and plotly's first figure to whoever visits first after a deploy or
+restart. This launcher does that work up front, in the server's own
+process: it times the heavy imports, runs rdpipeline.warm_up, then starts
+Streamlit on rddash.py, whose reruns find the modules loaded and the
+caches filled. Streamlit's health check (/_stcore/health) only answers
+once the server is up, so it reports ready after the warm-up. With
+RDDASH_API_PORT set, the JSON API starts first and its /health answers 503
+until the warm-up is done. The import and warm-up times are logged and
+shown in the dashboard's debug panel.
+
+To run several workers behind a balancer without each one loading its own
+copy of the tracker, start one loader and the workers with RDDASH_SHARED=1;
+they attach to the loader's memory-mapped dataset (see rdshared):
+
+    python rdshared.py --watch 30 &
+    RDDASH_SHARED=1 python serve.py --port 8501 &
+    RDDASH_SHARED=1 python serve.py --port 8502 &
+
+    python serve.py [--port 8501]
+"""
+import argparse
+import importlib
+import os
+import time
+
+# heavy imports, in load order; each is charged what it adds to the ones before it
+timed_imports = ['numpy', 'pandas', 'pyarrow.parquet', 'plotly.graph_objects', 'plotly.express', 'streamlit',
+                 'rdpipeline']
+
+SCRIPT_PATH = os.path.join(os.path.dirname(os.path.abspath(__file__)), 'rddash.py')
+
+
+def import_all():
+    times = {}
+    for name in timed_imports:
+        start = time.perf_counter()
+        importlib.import_module(name)
+        times[name] = round((time.perf_counter() - start) * 1000, 2)
+    return times
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description=__doc__.splitlines()[0])
+    parser.add_argument('--port', type=int, help='server port (default: Streamlit config)')
+    args = parser.parse_args()
+
+    import_times = import_all()
+    import rdapi
+    import rdpipeline
+    from streamlit import config
+    from streamlit.web import bootstrap
+
+    rdpipeline.startup['imports_ms'] = import_times
+    flag_options = {'server_port': args.port} if args.port else {}
+    bootstrap.load_config_options(flag_options=flag_options)
+    if os.environ.get('RDDASH_API_PORT'):
+        rdapi.start(int(os.environ['RDDASH_API_PORT']))
+
+    start = time.perf_counter()
+    rdpipeline.warm_up(static=config.get_option('server.enableStaticServing'))
+    print(f"Imports {sum(import_times.values()):.0f} ms, warm-up {(time.perf_counter() - start) * 1000:.0f} ms")
+    bootstrap.run(SCRIPT_PATH, False, [], flag_options)
@@ -0,0 +1,194 @@
+// Client-side filtering for the static snapshot (see export_snapshot.py).
+//
+// RDDATA (data.js) is the compact index shared by every page: the sidebar
+// options, the rows holding each option, each row's countries, USD amount
+// and search tokens per field. RDVIEW (inline in each page) holds the page's selection
+// and its Plotly figure specs, whose values are swapped for the aggregates
+// of whatever the reader selects.
+(function () {
+  'use strict';
+  var data = window.RDDATA, view = window.RDVIEW;
+  var dims = ['type', 'themes', 'subthemes', 'entityType', 'entity'];
+  var n = data.amounts.length;
+
+  // option rows as membership arrays, built once
+  var member = {};
+  dims.forEach(function (dim) {
+    member[dim] = data.members[dim].map(function (rows) {
+      var hit = new Uint8Array(n);
+      rows.forEach(function (r) { hit[r] = 1; });
+      return hit;
+    });
+  });
+  // same normalisation as rdsearch.normalize, each distinct term once
+  function terms(query) {
+    var text = query.toLowerCase().normalize('NFKD').replace(/[\u0300-\u036f]/g, '');
+    return (text.match(/[\p{L}\p{N}_]+/gu) || []).filter(function (t, i, all) { return all.indexOf(t) === i; });
+  }
+  var fields = Object.keys(data.text).map(function (column) {
+    return {
+      weight: data.searchWeights[column],
+      tokens: data.text[column].map(function (t) { return t ? t.split(' ') : []; })
+    };
+  });
+
+  // as rdsearch.SearchIndex.scores: every term must prefix a token of the
+  // row, and each token it prefixes adds its field's weight; null without terms
+  function scores(query) {
+    var list = terms(query);
+    if (!list.length) return null;
+    var total = new Float64Array(n);
+    list.forEach(function (term) {
+      for (var r = 0; r < n; r++) {
+        if (total[r] < 0) continue;
+        var score = 0;
+        fields.forEach(function (field) {
+          field.tokens[r].forEach(function (token) {
+            if (token.lastIndexOf(term, 0) === 0) score += field.weight;
+          });
+        });
+        total[r] = score ? total[r] + score : -1;
+      }
+    });
+    return total;
+  }
+
+  // {mask, scores} for a selection; scores rank the matches of a search
+  function select(sel) {
+    var mask = new Uint8Array(n).fill(1);
+    var ranks = scores(sel.search);
+    if (ranks) {
+      for (var r = 0; r < n; r++) if (ranks[r] <= 0) mask[r] = 0;
+    }
+    dims.forEach(function (dim) {
+      if (sel[dim] === 'All') return;
+      var i = data.options[dim].indexOf(sel[dim]);
+      for (var r = 0; r < n; r++) {
+        if (i < 0 || !member[dim][i][r]) mask[r] = 0;
+      }
+    });
+    return {mask: mask, scores: ranks};
+  }
+
+  function aggregate(mask) {
+    function counts(dim) {
+      return member[dim].map(function (hit) {
+        var c = 0;
+        for (var r = 0; r < n; r++) c += mask[r] & hit[r];
+        return c;
+      });
+    }
+    var agg = {
+      rows: [], money: 0,
+      type: counts('type'), themes: counts('themes'), entityType: counts('entityType'),
+      countryCounts: new Array(data.countries.length).fill(0),
+      countryFunding: new Array(data.countries.length).fill(0)
+    };
+    for (var r = 0; r < n; r++) {
+      if (!mask[r]) continue;
+      agg.rows.push(r);
+      agg.money += data.amounts[r];
+      data.rowCountries[r].forEach(function (c) {
+        agg.countryCounts[c] += 1;
+        agg.countryFunding[c] += data.amounts[r];
+      });
+    }
+    return agg;
+  }
+
+  // copy of a figure spec of this page, with the shared layout template put back
+  function figure(name) {
+    var spec = JSON.parse(JSON.stringify(view.figures[name]));
+    spec.layout.template = data.template;
+    return spec;
+  }
+
+  function drawMap(agg) {
+    var metric = document.querySelector('input[name="map-metric"]:checked').value;
+    var values = metric === 'usd' ? agg.countryFunding : agg.countryCounts;
+    var byCountry = {};
+    data.countries.forEach(function (c, i) { byCountry[c] = values[i]; });
+    var spec = figure('map_' + metric);
+    var trace = spec.data[0];
+    trace.z = trace.locations.map(function (c) { return byCountry[c]; });
+    var min = Math.min.apply(null, trace.z), max = Math.max.apply(null, trace.z);
+    trace.zmin = metric === 'count' && min > 3 ? min - 2 : 0;
+    trace.zmax = Math.max(max, 1);
+    Plotly.react('fig-map', spec.data, spec.layout, {responsive: true});
+  }
+
+  function drawPie(id, name, values) {
+    var spec = figure(name);
+    spec.data[0].values = values;
+    Plotly.react(id, spec.data, spec.layout, {responsive: true});
+  }
+
+  var current = null, page = 0;
+
+  function showCards() {
+    var size = data.pageSize, rows = current.rows;
+    var pages = Math.max(1, Math.ceil(rows.length / size));
+    page = Math.min(page, pages - 1);
+    var shown = {};
+    rows.slice(page * size, (page + 1) * size).forEach(function (r) { shown[r] = true; });
+    var list = document.getElementById('cards');
+    rows.forEach(function (r) {
+      var card = document.getElementById('card-' + r);
+      if (shown[r]) list.appendChild(card);  // keep cards in result order
+    });
+    Array.prototype.forEach.call(list.children, function (card) {
+      card.hidden = !shown[card.getAttribute('data-row')];
+    });
+    document.getElementById('showing').textContent = rows.length
+      ? 'Showing ' + (page * size + 1) + '-' + Math.min(rows.length, (page + 1) * size) + ' of ' + rows.length
+      : 'No commitments match the filter criteria.';
+    document.getElementById('prev').disabled = page === 0;
+    document.getElementById('next').disabled = page >= pages - 1;
+  }
+
+  function update() {
+    var sel = {search: document.getElementById('search').value};
+    dims.forEach(function (dim) { sel[dim] = document.getElementById('filter-' + dim).value; });
+    var picked = select(sel);
+    current = aggregate(picked.mask);
+    if (picked.scores) {
+      // best match first, ties in tracker order, as rddata.apply_filters ranks them
+      current.rows.sort(function (a, b) { return picked.scores[b] - picked.scores[a]; });
+    }
+    page = 0;
+    document.getElementById('total-commitments').textContent = current.rows.length;
+    drawMap(current);
+    drawPie('fig-type', 'type', current.type);
+    drawPie('fig-theme', 'theme', current.themes);
+    drawPie('fig-entType', 'entType', current.entityType);
+    var money = figure('money');
+    money.data[1].x = [current.money];
+    Plotly.react('fig-money', money.data, money.layout, {responsive: true});
+    showCards();
+  }
+
+  // the page is pre-rendered for view.selection; only wire up the controls
+  var map = figure('map_count');
+  Plotly.newPlot('fig-map', map.data, map.layout, {responsive: true});
+  ['type', 'theme', 'entType', 'money'].forEach(function (name) {
+    var spec = figure(name);
+    Plotly.newPlot('fig-' + name, spec.data, spec.layout, {responsive: true});
+  });
+  current = {rows: view.rows};
+  dims.concat(['search']).forEach(function (id) {
+    var el = document.getElementById(id === 'search' ? 'search' : 'filter-' + id);
+    el.addEventListener(id === 'search' ? 'input' : 'change', update);
+  });
+  document.querySelectorAll('input[name="map-metric"]').forEach(function (el) {
+    el.addEventListener('change', function () {
+      if (current.countryCounts) {
+        drawMap(current);
+      } else {
+        var spec = figure('map_' + el.value);
+        Plotly.react('fig-map', spec.data, spec.layout, {responsive: true});
+      }
+    });
+  });
+  document.getElementById('prev').addEventListener('click', function () { page -= 1; showCards(); });
+  document.getElementById('next').addEventListener('click', function () { page += 1; showCards(); });
+})();